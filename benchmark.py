@@ -0,0 +1,727 @@
+"""
+Benchmarks for the carpool graph. Run one with for example:
+    python benchmark.py memory --locations 100000
+The suite benchmark runs every generator, size and passenger density and writes JSON that another run can be compared with:
+    python benchmark.py suite --sizes 1000,10000,100000 --output before.json
+    python benchmark.py suite --sizes 1000,10000,100000 --baseline before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import math
+import multiprocessing
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from array import array
+
+from carpool import Graph, CSRGraph, Label, ParallelRouter, QUEUES, SearchContext, write_roads
+
+
+def road_stream(locations, degree, seed):
+    """
+    Function description: Generates a seeded random road network with locations * degree roads as (u,v,w1,w2) tuples
+    ordered by source, where the carpool lane weight w2 is never worse than the solo lane weight w1.
+    """
+    rng = random.Random(seed)
+    for u in range(locations):
+        for _ in range(degree):
+            w1 = rng.randint(1, 100)
+            yield (u, rng.randrange(locations), w1, rng.randint(1, w1))
+
+
+def random_roads(locations, degree, seed):
+    return list(road_stream(locations, degree, seed))
+
+
+def grid_road_stream(locations, seed):
+    """
+    Function description: Generates a seeded grid of locations, in rows as wide as the square root of locations with the last
+    row cut short, with a road both ways between neighbours. It is closer to a city than random_roads for searches that
+    aim at the destination.
+    """
+    rng = random.Random(seed)
+    side = math.isqrt(locations)
+    if side * side < locations:
+        side += 1
+    for u in range(locations):
+        for v in (u + 1 if (u + 1) % side != 0 and u + 1 < locations else None, u + side if u + side < locations else None):
+            if v is not None:
+                for a, b in ((u, v), (v, u)):
+                    w1 = rng.randint(1, 100)
+                    yield (a, b, w1, rng.randint(1, w1))
+
+
+def grid_roads(side, seed):
+    return list(grid_road_stream(side * side, seed))
+
+
+GEOMETRIC_MIN_DEGREE = 8 #Below about 5 roads per location a random geometric network falls apart into small pieces
+
+
+def geometric_road_stream(locations, degree, seed):
+    """
+    Function description: Generates a seeded random geometric network: the locations are points in a unit square and there is
+    a road both ways between every two points closer than the radius that gives degree roads per location on average,
+    but at least GEOMETRIC_MIN_DEGREE so that almost every location is connected to the others.
+    w1 goes from 1 to 100 with the length of the road. The points are bucketed in squares as wide as the radius so only
+    the neighbouring squares are searched.
+    """
+    rng = random.Random(seed)
+    xs = array('d', (rng.random() for _ in range(locations)))
+    ys = array('d', (rng.random() for _ in range(locations)))
+    radius = math.sqrt(max(degree, GEOMETRIC_MIN_DEGREE) / (math.pi * max(1, locations)))
+    cells = max(1, int(1 / radius))
+    buckets = {}
+    for u in range(locations):
+        buckets.setdefault((int(xs[u] * cells), int(ys[u] * cells)), []).append(u)
+    for u in range(locations):
+        cx, cy = int(xs[u] * cells), int(ys[u] * cells)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for v in buckets.get((cx + dx, cy + dy), ()):
+                    if v > u:
+                        length = math.hypot(xs[u] - xs[v], ys[u] - ys[v])
+                        if length <= radius:
+                            for a, b in ((u, v), (v, u)):
+                                w1 = max(1, round(100 * length / radius))
+                                yield (a, b, w1, rng.randint(1, w1))
+
+
+def scale_free_road_stream(locations, degree, seed):
+    """
+    Function description: Generates a seeded scale-free network by preferential attachment (Barabasi-Albert): every location
+    after the first joins degree // 2 earlier ones (at least 1) picked with a chance that grows with their roads, with a
+    road both ways, so a few hubs end up with most of the roads.
+    """
+    rng = random.Random(seed)
+    joins = max(1, degree // 2)
+    ends = array('q') #Every location once per road it has, picking from it favours the hubs
+    for u in range(1, locations):
+        if u <= joins:
+            picked = range(u)
+        else:
+            picked = set()
+            while len(picked) < joins:
+                picked.add(ends[rng.randrange(len(ends))])
+            picked = sorted(picked)
+        for v in picked:
+            for a, b in ((u, v), (v, u)):
+                w1 = rng.randint(1, 100)
+                yield (a, b, w1, rng.randint(1, w1))
+            ends.append(u)
+            ends.append(v)
+
+
+GENERATORS = {
+    "grid": lambda locations, degree, seed: grid_road_stream(locations, seed),
+    "geometric": geometric_road_stream,
+    "scale_free": scale_free_road_stream,
+    "random": road_stream,
+}
+
+
+def random_passengers(locations, density, seed):
+    rng = random.Random(seed)
+    return rng.sample(range(locations), int(locations * density))
+
+
+def build_graph(roads, locations, passengers):
+    graph = Graph(0, 2 * locations, passengers, 0, 0)
+    for road in roads:
+        graph.addTuple(road, locations)
+    return graph
+
+
+def measure(build):
+    """
+    Function description: Returns the object built by build() together with the bytes it kept allocated and the seconds it took.
+    """
+    tracemalloc.start()
+    begin = time.perf_counter()
+    built = build()
+    seconds = time.perf_counter() - begin
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return built, size, seconds
+
+
+def bench_memory(args):
+    roads = random_roads(args.locations, args.degree, args.seed)
+    passengers = random_passengers(args.locations, args.density, args.seed)
+    _, graph_bytes, graph_seconds = measure(lambda: build_graph(roads, args.locations, passengers))
+    _, csr_bytes, csr_seconds = measure(lambda: CSRGraph.from_tuples(roads, 0, 2 * args.locations, passengers, 0, 0))
+    print("%d locations, %d roads" % (args.locations, len(roads)))
+    print("Graph    %12d bytes %8.3fs" % (graph_bytes, graph_seconds))
+    print("CSRGraph %12d bytes %8.3fs" % (csr_bytes, csr_seconds))
+    print("CSRGraph uses %.1fx less memory" % (graph_bytes / csr_bytes))
+
+
+def binary_search(vertices, key, low, high):
+    """
+    Function description: The recursive binary search Graph.findVertex used before it had an index, kept as the baseline.
+    """
+    if high >= low:
+        mid = low + (high - low)//2
+        if vertices[mid].id == key:
+            return vertices[mid]
+        elif vertices[mid].id > key:
+            return binary_search(vertices, key, low, mid-1)
+        else:
+            return binary_search(vertices, key, mid + 1, high)
+    return "Not found"
+
+
+def bench_lookup(args):
+    """
+    Function description: Times the edge relaxation loop of Graph.dijkstra over every edge of the graph, once resolving the
+    child with the old binary search and once with the index stored on the edge.
+    """
+    roads = random_roads(args.locations, args.degree, args.seed)
+    passengers = random_passengers(args.locations, args.density, args.seed)
+    graph = build_graph(roads, args.locations, passengers)
+    vertices = graph.vertices
+    for vertex in vertices:
+        vertex.distance = 0
+
+    def relax_binary_search():
+        for served in vertices:
+            for edge in served.edges:
+                child = binary_search(vertices, edge.destination, 0, len(vertices)-1)
+                if child.distance > served.distance + edge.weight:
+                    child.distance = served.distance + edge.weight
+
+    def relax_index():
+        for served in vertices:
+            for edge in served.edges:
+                child = vertices[edge.index]
+                if child.distance > served.distance + edge.weight:
+                    child.distance = served.distance + edge.weight
+
+    relaxations = sum(len(vertex.edges) for vertex in vertices)
+    print("%d locations, %d relaxations per sweep" % (args.locations, relaxations))
+    for name, sweep in (("binary search", relax_binary_search), ("index", relax_index)):
+        best = math.inf
+        for _ in range(args.repeat):
+            begin = time.perf_counter()
+            sweep()
+            best = min(best, time.perf_counter() - begin)
+        print("%-14s %12.0f relaxations/s" % (name, relaxations / best))
+
+
+def random_queries(locations, amount, seed):
+    rng = random.Random(seed)
+    return [(rng.randrange(locations), rng.randrange(locations)) for _ in range(amount)]
+
+
+def bench_parallel(args):
+    """
+    Function description: Throughput of route_many in this process and on a ParallelRouter with 1, 2, 4... workers up to
+    --workers. Starting the pool and putting the graph in shared memory are not timed.
+    """
+    roads = random_roads(args.locations, args.degree, args.seed)
+    passengers = random_passengers(args.locations, args.density, args.seed)
+    graph = CSRGraph.from_tuples(roads, 0, 2 * args.locations, passengers, 0, 0)
+    queries = random_queries(args.locations, args.queries, args.seed)
+    print("%d locations, %d roads, %d queries" % (args.locations, len(roads), len(queries)))
+
+    begin = time.perf_counter()
+    graph.route_many(queries)
+    print("%-12s %10.1f queries/s" % ("in process", len(queries) / (time.perf_counter() - begin)))
+
+    workers = 1
+    single = None
+    while workers <= args.workers:
+        with ParallelRouter(graph, workers) as router:
+            router.route_many(queries[:workers]) #Wait for every worker to attach
+            begin = time.perf_counter()
+            router.route_many(queries)
+            throughput = len(queries) / (time.perf_counter() - begin)
+        single = single or throughput
+        print("%2d workers   %10.1f queries/s %6.2fx" % (workers, throughput, throughput / single))
+        workers *= 2
+
+
+def settled(context):
+    """
+    Function description: The amount of locations the last query on context served.
+    """
+    return sum(1 for label in context.labels if label is not None and label.stamp == context.generation and label.visited)
+
+
+def bench_modes(args):
+    """
+    Function description: Locations served and latency of dijkstra (which serves both copies of the destination) and of
+    route in every mode, on a grid of about --locations locations.
+    """
+    side = max(2, int(math.sqrt(args.locations)))
+    locations = side * side
+    roads = grid_roads(side, args.seed)
+    passengers = random_passengers(locations, args.density, args.seed)
+    graph = CSRGraph.from_tuples(roads, 0, 2 * locations, passengers, 0, 0)
+    queries = random_queries(locations, args.queries, args.seed)
+    begin = time.perf_counter()
+    graph.prepare_landmarks(args.landmarks)
+    print("%d locations, %d roads, %d queries, %d landmarks in %.2fs" % (locations, len(roads), len(queries), args.landmarks, time.perf_counter() - begin))
+
+    def run_dijkstra(source, destination):
+        with contextlib.redirect_stdout(io.StringIO()):
+            graph.dijkstra(source, destination)
+
+    searches = [("dijkstra", run_dijkstra)]
+    for mode in ("dijkstra", "bidirectional", "alt"):
+        searches.append(("route " + mode, lambda source, destination, mode=mode: graph.route(source, destination, mode)))
+    for name, search in searches:
+        served = 0
+        seconds = 0
+        for source, destination in queries:
+            begin = time.perf_counter()
+            search(source, destination)
+            seconds += time.perf_counter() - begin
+            served += settled(graph.context) + (settled(graph.reverse_context) if name == "route bidirectional" else 0)
+        print("%-20s %10.1f served/query %8.2fms/query" % (name, served / len(queries), 1000 * seconds / len(queries)))
+
+
+def bench_snapshot(args):
+    """
+    Function description: Cold start time of rebuilding the graph from tuples with addTuple compared to loading a snapshot,
+    both into a Graph and memory mapped into a CSRGraph, and of the first query after each.
+    """
+    roads = random_roads(args.locations, args.degree, args.seed)
+    passengers = random_passengers(args.locations, args.density, args.seed)
+    source, destination = random_queries(args.locations, 1, args.seed)[0]
+    path = os.path.join(tempfile.mkdtemp(), "graph.carpool")
+    build_graph(roads, args.locations, passengers).save(path)
+    print("%d locations, %d roads, snapshot of %d bytes" % (args.locations, len(roads), os.path.getsize(path)))
+
+    starts = (
+        ("addTuple", lambda: build_graph(roads, args.locations, passengers)),
+        ("Graph.load", lambda: Graph.load(path)),
+        ("CSRGraph.load", lambda: CSRGraph.load(path, mapped=False)),
+        ("CSRGraph.load mapped", lambda: CSRGraph.load(path)),
+    )
+    for name, start in starts:
+        begin = time.perf_counter()
+        graph = start()
+        loaded = time.perf_counter() - begin
+        graph.route(source, destination)
+        print("%-22s %9.4fs to load %9.4fs to the first route" % (name, loaded, time.perf_counter() - begin))
+    os.remove(path)
+
+
+def bench_build(args):
+    """
+    Function description: Time to build the graph with CSRGraph.from_roads from a binary road file ordered by source,
+    the same file shuffled, a CSV file and an iterator, compared to addTuple (only up to --baseline-roads roads).
+    """
+    directory = tempfile.mkdtemp()
+    ordered = os.path.join(directory, "ordered.roads")
+    shuffled = os.path.join(directory, "shuffled.roads")
+    table = os.path.join(directory, "roads.csv")
+    write_roads(ordered, road_stream(args.locations, args.degree, args.seed))
+    with open(ordered, "rb") as file:
+        data = file.read()
+    records = [data[k:k + 32] for k in range(0, len(data), 32)]
+    random.Random(args.seed).shuffle(records)
+    with open(shuffled, "wb") as file:
+        file.write(b"".join(records))
+    del data, records
+    with open(table, "w") as file:
+        file.writelines("%d,%d,%d,%d\n" % road for road in road_stream(args.locations, args.degree, args.seed))
+    roads = args.locations * args.degree
+    passengers = random_passengers(args.locations, args.density, args.seed)
+    print("%d locations, %d roads" % (args.locations, roads))
+
+    builds = [
+        ("binary ordered", lambda: CSRGraph.from_roads(ordered, 0, 2 * args.locations, passengers, 0, 0)),
+        ("binary shuffled", lambda: CSRGraph.from_roads(shuffled, 0, 2 * args.locations, passengers, 0, 0)),
+        ("csv", lambda: CSRGraph.from_roads(table, 0, 2 * args.locations, passengers, 0, 0)),
+        ("iterator", lambda: CSRGraph.from_roads(road_stream(args.locations, args.degree, args.seed), 0, 2 * args.locations, passengers, 0, 0)),
+    ]
+    if roads <= args.baseline_roads:
+        builds.append(("addTuple", lambda: build_graph(road_stream(args.locations, args.degree, args.seed), args.locations, passengers)))
+    for name, build in builds:
+        begin = time.perf_counter()
+        build()
+        seconds = time.perf_counter() - begin
+        print("%-16s %9.2fs %12.0f roads/s" % (name, seconds, roads / seconds))
+    for path in (ordered, shuffled, table):
+        os.remove(path)
+
+
+def bench_queues(args):
+    """
+    Function description: Throughput of add, decrease and serve of every priority queue in QUEUES on --elements labels with
+    random distances, then the time of route_many with each queue on a random road network.
+    """
+    rng = random.Random(args.seed)
+    distances = [rng.random() * 1000 for _ in range(args.elements)]
+    decreases = [(rng.randrange(args.elements), rng.random()) for _ in range(args.elements)]
+    print("%d elements, %d decreases" % (args.elements, len(decreases)))
+    for name, queue in sorted(QUEUES.items()):
+        labels = [Label(index) for index in range(args.elements)]
+        for label, distance in zip(labels, distances):
+            label.reset(0)
+            label.distance = distance
+        heap = queue(args.elements)
+        begin = time.perf_counter()
+        for label in labels:
+            heap.add(label)
+        added = time.perf_counter()
+        for index, fraction in decreases:
+            labels[index].distance *= fraction
+            heap.decrease(labels[index])
+        decreased = time.perf_counter()
+        while len(heap) > 0:
+            heap.serve()
+        served = time.perf_counter()
+        print("%-10s %10.0f adds/s %10.0f decreases/s %10.0f serves/s" % (name, args.elements / (added - begin),
+              len(decreases) / (decreased - added), args.elements / (served - decreased)))
+
+    roads = random_roads(args.locations, args.degree, args.seed)
+    passengers = random_passengers(args.locations, args.density, args.seed)
+    graph = CSRGraph.from_tuples(roads, 0, 2 * args.locations, passengers, 0, 0)
+    queries = random_queries(args.locations, args.queries, args.seed)
+    print("%d locations, %d roads, %d queries" % (args.locations, len(roads), len(queries)))
+    for name in sorted(QUEUES):
+        context = SearchContext(graph, name)
+        begin = time.perf_counter()
+        graph.route_many(queries, context)
+        print("%-10s %8.2fms/query" % (name, 1000 * (time.perf_counter() - begin) / len(queries)))
+
+
+def bench_long_route(args):
+    """
+    Function description: Routes from one end of a line of --hops locations to the other, with a passenger halfway so the best
+    route switches to the carpool lane. Rebuilding a route this long used to recurse once per hop, far past the recursion
+    limit. test_carpool.py checks the route, this only times it.
+    """
+    roads = [(u, u + 1, 2, 1) for u in range(args.hops - 1)]
+    passengers = [args.hops // 2]
+    graph = build_graph(roads, args.hops, passengers)
+    snapshot = CSRGraph.from_tuples(roads, 0, 2 * args.hops, passengers, 0, 0)
+    for name, routed in (("Graph", graph), ("CSRGraph", snapshot)):
+        begin = time.perf_counter()
+        route = routed.route(0, args.hops - 1)
+        seconds = time.perf_counter() - begin
+        print("%-9s %d hops in %.3fs" % (name, len(route.path) - 1, seconds))
+
+
+def bench_cache(args):
+    """
+    Function description: Time of route_many without and with enable_cache on --queries queries from --sources hot sources,
+    split in batches of 100 so the cache is reused across calls, with the hit rate of the cache.
+    """
+    roads = random_roads(args.locations, args.degree, args.seed)
+    passengers = random_passengers(args.locations, args.density, args.seed)
+    graph = CSRGraph.from_tuples(roads, 0, 2 * args.locations, passengers, 0, 0)
+    rng = random.Random(args.seed)
+    sources = rng.sample(range(args.locations), args.sources)
+    queries = [(rng.choice(sources), rng.randrange(args.locations)) for _ in range(args.queries)]
+    batches = [queries[start:start + 100] for start in range(0, len(queries), 100)]
+    print("%d locations, %d roads, %d queries from %d sources" % (args.locations, len(roads), len(queries), len(sources)))
+    results = {}
+    for name, size in (("no cache", None), ("cache", args.cache_size)):
+        graph.cache = None if size is None else graph.enable_cache(size)
+        begin = time.perf_counter()
+        results[name] = [route.cost for batch in batches for route in graph.route_many(batch)]
+        print("%-9s %8.2fms/query" % (name, 1000 * (time.perf_counter() - begin) / len(queries)))
+    assert results["no cache"] == results["cache"], "cached routes cost differently"
+    print(graph.cache.info())
+
+
+def bench_churn(args):
+    """
+    Function description: Time of keeping the passengers up to date over --steps steps in which a --churn fraction of them is
+    dropped off and as many new ones are picked up, by rebuilding the graph from its roads and by remove_passengers and
+    add_passengers, for Graph and CSRGraph. Checks both ways give the same routes after the last step.
+    """
+    roads = random_roads(args.locations, args.degree, args.seed)
+    passengers = set(random_passengers(args.locations, args.density, args.seed))
+    rng = random.Random(args.seed)
+    steps = []
+    for _ in range(args.steps):
+        dropped = rng.sample(sorted(passengers), int(len(passengers) * args.churn))
+        picked = rng.sample([u for u in range(args.locations) if u not in passengers], len(dropped))
+        passengers = (passengers - set(dropped)) | set(picked)
+        steps.append((dropped, picked, sorted(passengers)))
+    queries = random_queries(args.locations, 100, args.seed)
+    print("%d locations, %d roads, %d passengers, %d changed per step" % (args.locations, len(roads), len(passengers), 2 * len(dropped)))
+    initial = random_passengers(args.locations, args.density, args.seed)
+    builders = (("Graph", lambda current: build_graph(roads, args.locations, current)),
+                ("CSRGraph", lambda current: CSRGraph.from_tuples(roads, None, 2 * args.locations, current, 0, None)))
+    for name, build in builders:
+        begin = time.perf_counter()
+        for _, _, current in steps:
+            rebuilt = build(current)
+        rebuild = (time.perf_counter() - begin) / len(steps)
+        graph = build(initial)
+        begin = time.perf_counter()
+        for dropped, picked, _ in steps:
+            graph.remove_passengers(dropped)
+            graph.add_passengers(picked)
+        update = (time.perf_counter() - begin) / len(steps)
+        assert [route.cost for route in graph.route_many(queries)] == [route.cost for route in rebuilt.route_many(queries)]
+        print("%-9s rebuild %9.3fms/step  update %7.3fms/step %8.0fx" % (name, 1000 * rebuild, 1000 * update, rebuild / update))
+
+
+def bench_traffic(args):
+    """
+    Function description: Time per step of changing the weights of --changes random roads with update_weights and answering
+    --queries queries from --sources sources, when the cached trees are dropped and searched again and when the dynamic
+    cache repairs them. Checks both give the same costs.
+    """
+    roads = random_roads(args.locations, args.degree, args.seed)
+    passengers = random_passengers(args.locations, args.density, args.seed)
+    rng = random.Random(args.seed)
+    sources = rng.sample(range(args.locations), args.sources)
+    queries = [(rng.choice(sources), rng.randrange(args.locations)) for _ in range(args.queries)]
+    batches = []
+    for _ in range(args.steps):
+        batch = []
+        for u, v, w1, _ in rng.sample(roads, args.changes): #Traffic moves the weights up or down by up to half
+            w1 = max(1, int(w1 * rng.uniform(0.5, 1.5)))
+            batch.append((u, v, w1, rng.randint(1, w1)))
+        batches.append(batch)
+    print("%d locations, %d roads, %d changes per step, %d queries from %d sources" % (args.locations, len(roads),
+          args.changes, len(queries), len(sources)))
+    results = {}
+    for name, dynamic in (("search", False), ("repair", True)):
+        graph = CSRGraph.from_tuples(roads, None, 2 * args.locations, passengers, 0, None)
+        graph.enable_cache(len(sources), dynamic)
+        graph.route_many(queries)
+        begin = time.perf_counter()
+        costs = []
+        for batch in batches:
+            graph.update_weights(batch)
+            costs.append([route.cost for route in graph.route_many(queries)])
+        results[name] = costs
+        print("%-7s %8.2fms/step" % (name, 1000 * (time.perf_counter() - begin) / len(batches)))
+    assert results["search"] == results["repair"], "repaired trees cost differently"
+
+
+def bench_matrix(args):
+    """
+    Function description: Time of a --matrix x --matrix cost matrix from random sources to random targets with cost_matrix,
+    with route_many on every pair, and with cost_matrix on a ParallelRouter of --workers workers. Checks they all agree.
+    """
+    roads = random_roads(args.locations, args.degree, args.seed)
+    passengers = random_passengers(args.locations, args.density, args.seed)
+    graph = CSRGraph.from_tuples(roads, None, 2 * args.locations, passengers, 0, None)
+    rng = random.Random(args.seed)
+    sources = rng.sample(range(args.locations), min(args.matrix, args.locations))
+    targets = rng.sample(range(args.locations), min(args.matrix, args.locations))
+    print("%d locations, %d roads, %d x %d matrix" % (args.locations, len(roads), len(sources), len(targets)))
+
+    begin = time.perf_counter()
+    matrix = graph.cost_matrix(sources, targets)
+    print("%-12s %8.2fs" % ("cost_matrix", time.perf_counter() - begin))
+
+    begin = time.perf_counter()
+    routes = graph.route_many([(source, target) for source in sources for target in targets])
+    print("%-12s %8.2fs" % ("route_many", time.perf_counter() - begin))
+    assert [route.cost for route in routes] == [cost for row in matrix for cost in row], "route_many costs differently"
+
+    with ParallelRouter(graph, args.workers) as router:
+        router.cost_matrix(sources[:args.workers], targets) #Wait for every worker to attach
+        begin = time.perf_counter()
+        shared = router.cost_matrix(sources, targets)
+        print("%2d workers   %8.2fs" % (args.workers, time.perf_counter() - begin))
+    assert shared == matrix, "the workers cost differently"
+
+
+def bench_profile(args):
+    """
+    Function description: Time of --queries route queries before, inside and after a Profiler, to show the cost of recording
+    and that nothing is left behind once it is done, then the totals of what the recorded queries did.
+    """
+    roads = random_roads(args.locations, args.degree, args.seed)
+    passengers = random_passengers(args.locations, args.density, args.seed)
+    graph = build_graph(roads, args.locations, passengers)
+    queries = random_queries(args.locations, args.queries, args.seed)
+    print("%d locations, %d roads, %d queries" % (args.locations, len(roads), len(queries)))
+
+    def run():
+        begin = time.perf_counter()
+        for source, destination in queries:
+            graph.route(source, destination)
+        return 1000 * (time.perf_counter() - begin) / len(queries)
+
+    run() #Allocates the labels once so every run below starts the same
+    before = run()
+    with graph.profile() as profiler:
+        inside = run()
+    after = run()
+    print("before %.3fms/query, profiled %.3fms/query, after %.3fms/query" % (before, inside, after))
+    totals = {}
+    for stats in profiler.stats:
+        for name, value in stats.as_dict().items():
+            if name != "query":
+                totals[name] = totals.get(name, 0) + value
+    for name, value in totals.items():
+        print("%-15s %14.4f per query" % (name, value / len(profiler.stats)))
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def suite_run(generator, locations, density, kind, args):
+    """
+    Function description: Builds one graph of kind ("Graph" with Graph() then addTuple, or "CSRGraph" with from_tuples) from
+    generator and returns what it measured: the build time, the peak memory of a build traced by tracemalloc (a second build,
+    so tracing does not slow the timed one), the latency of --queries route queries and the throughput of route_many.
+    """
+    passengers = random_passengers(locations, density, args.seed)
+    stream = lambda: GENERATORS[generator](locations, args.degree, args.seed)
+    if kind == "Graph":
+        def build():
+            graph = Graph(0, 2 * locations, passengers, 0, None)
+            for road in stream():
+                graph.addTuple(road, locations)
+            return graph
+    else:
+        build = lambda: CSRGraph.from_tuples(stream(), None, 2 * locations, passengers, 0, None)
+
+    tracemalloc.start()
+    graph = build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del graph
+    begin = time.perf_counter()
+    graph = build()
+    build_seconds = time.perf_counter() - begin
+
+    queries = random_queries(locations, args.queries, args.seed)
+    graph.route(*queries[0]) #Allocates the labels once so every query below starts the same
+    latencies = []
+    for source, destination in queries:
+        begin = time.perf_counter()
+        graph.route(source, destination)
+        latencies.append(1000 * (time.perf_counter() - begin))
+    latencies.sort()
+    begin = time.perf_counter()
+    routes = graph.route_many(queries)
+    throughput = len(queries) / (time.perf_counter() - begin)
+    return {
+        "generator": generator,
+        "locations": locations,
+        "roads": sum(1 for _ in stream()),
+        "degree": args.degree,
+        "density": density,
+        "graph": kind,
+        "build_seconds": build_seconds,
+        "peak_bytes": peak,
+        "latency_ms": {"mean": sum(latencies) / len(latencies), "p50": percentile(latencies, 0.5),
+                       "p90": percentile(latencies, 0.9), "p99": percentile(latencies, 0.99)},
+        "throughput_qps": throughput,
+        "reachable": sum(1 for route in routes if route.path is not None) / len(routes), #Unreachable queries end early
+    }
+
+
+def bench_suite(args):
+    """
+    Function description: Runs suite_run for every generator in --generators, size in --sizes, passenger density in --densities
+    and graph in --graphs, prints a line for each, and writes them all to --output as JSON together with the settings and
+    the machine. With --baseline, the JSON of an earlier run, every run is also compared with the same run there
+    (above 1.00x is better now). A run where fewer than --min-reachable of the queries have a route gets a warning, since
+    its latencies mostly time queries that fail at once. Graph needs about 1KB per location, use --graphs CSRGraph for
+    sizes up to 1e7.
+    """
+    sizes = [int(float(size)) for size in args.sizes.split(",")]
+    densities = [float(density) for density in args.densities.split(",")]
+    baseline = {}
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            for run in json.load(file)["runs"]:
+                baseline[run["generator"], run["locations"], run["degree"], run["density"], run["graph"]] = run
+    runs = []
+    print("%-10s %9s %10s %7s %-8s %9s %12s %8s %8s %8s %10s" % ("generator", "locations", "roads", "density", "graph",
+          "build s", "peak bytes", "p50 ms", "p90 ms", "p99 ms", "queries/s"))
+    for generator in args.generators.split(","):
+        for size in sizes:
+            for density in densities:
+                for kind in args.graphs.split(","):
+                    run = suite_run(generator, size, density, kind, args)
+                    runs.append(run)
+                    latency = run["latency_ms"]
+                    print("%-10s %9d %10d %7.3f %-8s %9.3f %12d %8.2f %8.2f %8.2f %10.1f" % (generator, size, run["roads"],
+                          density, kind, run["build_seconds"], run["peak_bytes"], latency["p50"], latency["p90"],
+                          latency["p99"], run["throughput_qps"]))
+                    if run["reachable"] < args.min_reachable:
+                        run["warning"] = ("only %.0f%% of the queries have a route, the latencies mostly time queries that "
+                                          "fail at once" % (100 * run["reachable"]))
+                        print("%-10s warning: %s" % ("", run["warning"]), file=sys.stderr)
+                    before = baseline.get((generator, size, args.degree, density, kind))
+                    if before is not None:
+                        print("%-10s build %.2fx, memory %.2fx, p50 %.2fx, throughput %.2fx" % ("", before["build_seconds"] /
+                              run["build_seconds"], before["peak_bytes"] / run["peak_bytes"], before["latency_ms"]["p50"] /
+                              latency["p50"], run["throughput_qps"] / before["throughput_qps"]))
+    if args.output is not None:
+        report = {
+            "settings": {name: value for name, value in vars(args).items() if name not in ("output", "baseline")},
+            "machine": {"python": sys.version, "platform": platform.platform(), "cpus": multiprocessing.cpu_count()},
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "runs": runs,
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+BENCHMARKS = {
+    "suite": bench_suite,
+    "profile": bench_profile,
+    "matrix": bench_matrix,
+    "traffic": bench_traffic,
+    "churn": bench_churn,
+    "cache": bench_cache,
+    "long_route": bench_long_route,
+    "queues": bench_queues,
+    "build": bench_build,
+    "snapshot": bench_snapshot,
+    "modes": bench_modes,
+    "parallel": bench_parallel,
+    "lookup": bench_lookup,
+    "memory": bench_memory,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--locations", type=int, default=10000)
+    parser.add_argument("--degree", type=int, default=3, help="roads leaving every location")
+    parser.add_argument("--density", type=float, default=0.01, help="fraction of locations with passengers")
+    parser.add_argument("--seed", type=int, default=2004)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="most worker processes to try")
+    parser.add_argument("--baseline-roads", type=int, default=1000000, help="most roads to time addTuple on")
+    parser.add_argument("--elements", type=int, default=200000, help="elements to put in each priority queue")
+    parser.add_argument("--hops", type=int, default=50000, help="length of the route in long_route")
+    parser.add_argument("--landmarks", type=int, default=4)
+    parser.add_argument("--sources", type=int, default=20, help="distinct sources the queries in cache start from")
+    parser.add_argument("--cache-size", type=int, default=128, help="most shortest path trees to keep")
+    parser.add_argument("--churn", type=float, default=0.1, help="fraction of passengers replaced every step in churn")
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--changes", type=int, default=50, help="roads whose weights change every step in traffic")
+    parser.add_argument("--matrix", type=int, default=1000, help="sources and targets of the cost matrix")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated locations of the suite, 1e7 allowed")
+    parser.add_argument("--generators", default=",".join(GENERATORS), help="comma separated road networks of the suite")
+    parser.add_argument("--densities", default="0,0.01,0.1", help="comma separated passenger densities of the suite")
+    parser.add_argument("--graphs", default="Graph,CSRGraph", help="comma separated graphs the suite builds")
+    parser.add_argument("--output", help="JSON file the suite writes its runs to")
+    parser.add_argument("--baseline", help="JSON file of an earlier suite to compare with")
+    parser.add_argument("--min-reachable", type=float, default=0.9, help="fraction of suite queries with a route to expect")
+    parser.add_argument("--repeat", type=int, default=3, help="runs to take the best time from")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
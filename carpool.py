@@ -1,6 +1,18 @@
 from ctypes import py_object
-from typing import TypeVar, Generic
+from typing import TypeVar, Generic, NamedTuple
+import heapq
+from array import array
+from collections import Counter, OrderedDict
+from itertools import accumulate, islice, repeat
+from multiprocessing import shared_memory
+import csv
 import math
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
 T = TypeVar('T')
 
 
@@ -48,6 +60,20 @@ class Heap2(Generic[T]): #Credit to FIT1008 for giving me this class. However, I
     def __len__(self) -> int:
         return self.length
 
+    def clear(self) -> None:
+        """ Empties the heap in O(1) so it can be reused """
+        self.length = 0
+
+    def peek(self):
+        """ Returns the smallest element without serving it
+        :pre: self.length > 0
+        """
+        return self.the_array[1]
+
+    def decrease(self, element: T) -> None:
+        """ Rises element after its distance has been lowered, in O(log(n)) """
+        self.rise(element.pos)
+
     def is_full(self) -> bool:
         return self.length + 1 == len(self.the_array)
 
@@ -140,7 +166,1075 @@ class Heap2(Generic[T]): #Credit to FIT1008 for giving me this class. However, I
             k = child
 
 
-class Graph:
+class LazyHeap(Generic[T]):
+    def __init__(self, max_size: int = 0) -> None:
+        """
+        Function description: Min heap of elements by .distance built on heapq, with the same add, decrease, serve and peek as
+        Heap2. decrease pushes a new entry instead of moving the old one. The old entry is skipped when it reaches the top
+        because its distance is no longer the distance of its element. Entries are (distance, index, element) tuples
+        compared in C, so nothing is swapped through Python code. max_size is only there to match Heap2.
+        :Aux space complexity: O(adds + decreases) until the heap is cleared
+        """
+        self.entries = []
+        self.length = 0 #Elements in the heap, not entries
+
+    def __len__(self) -> int:
+        return self.length
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.length = 0
+
+    def add(self, element: T) -> bool:
+        heapq.heappush(self.entries, (element.distance, element.index, element))
+        self.length += 1
+        return True
+
+    def decrease(self, element: T) -> None:
+        heapq.heappush(self.entries, (element.distance, element.index, element))
+
+    def _drop_stale(self) -> None:
+        entries = self.entries
+        while entries[0][0] != entries[0][2].distance: #An element only gets a new entry when its distance goes down
+            heapq.heappop(entries)
+
+    def peek(self) -> T:
+        self._drop_stale()
+        return self.entries[0][2]
+
+    def serve(self) -> T:
+        """ Serves the element with the smallest distance in amortised O(log(n)) :pre: len(self) > 0 """
+        self._drop_stale()
+        self.length -= 1
+        return heapq.heappop(self.entries)[2]
+
+
+class QuaternaryHeap(Generic[T]):
+    def __init__(self, max_size: int = 0) -> None:
+        """
+        Function description: Indexed min heap of elements by .distance where every node has 4 children, kept in a Python list
+        from position 0. Like Heap2 it keeps the position of every element in .pos so decrease can find it, but the tree is
+        half as deep and an element moves by shifting the elements in its way into a hole, so each level costs one write
+        instead of a swap. max_size is only there to match Heap2, the list grows as needed.
+        :Aux space complexity: O(n)
+        """
+        self.the_array = []
+
+    def __len__(self) -> int:
+        return len(self.the_array)
+
+    def clear(self) -> None:
+        self.the_array.clear()
+
+    def peek(self) -> T:
+        return self.the_array[0]
+
+    def add(self, element: T) -> bool:
+        self.the_array.append(element)
+        self.rise(element, len(self.the_array) - 1)
+        return True
+
+    def decrease(self, element: T) -> None:
+        self.rise(element, element.pos)
+
+    def rise(self, element: T, k: int) -> None:
+        """ Moves element up from position k to where it belongs in O(log4(n)) """
+        the_array = self.the_array
+        distance = element.distance
+        while k > 0:
+            parent = (k - 1) >> 2
+            above = the_array[parent]
+            if above.distance <= distance:
+                break
+            the_array[k] = above
+            above.pos = k
+            k = parent
+        the_array[k] = element
+        element.pos = k
+
+    def serve(self) -> T:
+        """ Serves the element with the smallest distance in O(log4(n)) :pre: len(self) > 0 """
+        the_array = self.the_array
+        smallest = the_array[0]
+        last = the_array.pop()
+        if len(the_array) > 0:
+            self.sink(last, 0)
+        return smallest
+
+    def sink(self, element: T, k: int) -> None:
+        """ Moves element down from position k to where it belongs in O(4log4(n)) """
+        the_array = self.the_array
+        length = len(the_array)
+        distance = element.distance
+        while True:
+            first = 4 * k + 1
+            if first >= length:
+                break
+            best = first
+            best_distance = the_array[first].distance
+            for child in range(first + 1, min(first + 4, length)):
+                if the_array[child].distance < best_distance:
+                    best = child
+                    best_distance = the_array[child].distance
+            if best_distance >= distance:
+                break
+            the_array[k] = the_array[best]
+            the_array[k].pos = k
+            k = best
+        the_array[k] = element
+        element.pos = k
+
+
+QUEUES = {"binary": Heap2, "lazy": LazyHeap, "quaternary": QuaternaryHeap} #Priority queues a SearchContext can use
+
+
+class Label:
+    __slots__ = ("index", "pos", "distance", "previous", "visited", "stamp")
+
+    def __init__(self, index) -> None:
+        """
+        Function description: The state of one location during a query of a SearchContext. It replaces the distance,
+        previous, visited and pos properties a Vertex used to hold, so that a query does not write to the graph.
+        previous is the position of the previous location or -1 for the source.
+        """
+        self.index = index
+        self.pos = 1
+        self.stamp = -1
+
+    def reset(self, stamp) -> None:
+        self.distance = math.inf
+        self.previous = -1
+        self.visited = False
+        self.stamp = stamp
+
+
+class SearchContext:
+    def __init__(self, graph, queue="lazy") -> None:
+        """
+        Function description: Holds everything a query on graph needs (a label per location and the heap) so that it is
+        allocated once and reused by every query. Each query begins a new generation and a label is only reset the first
+        time the query touches it, so a query costs the locations it explored instead of every location in the graph.
+        Several contexts can search the same graph at once because a query never writes to the graph.
+        The graph only has to give its amount of locations with len(), indexOf(id) and _arcs(index) which is a list
+        of (position of destination, weight) for the edges leaving the location at index.
+        queue names the priority queue in QUEUES to use: "lazy" (LazyHeap), "binary" (Heap2) or "quaternary" (QuaternaryHeap).
+        LazyHeap is the default because it serves the fastest, see benchmark.py queues.
+        :Aux space complexity: O(|L|) for the labels of the locations that have been touched and the heap
+        """
+        self.graph = graph
+        self.queue = queue
+        self.labels = []
+        self.generation = 0
+        self.discovered = QUEUES[queue](0)
+
+    def begin(self) -> None:
+        """
+        Function description: Starts a new query. The time complexity is O(1) unless the graph has more
+        locations than in the last query, then the labels and heap are grown in O(|L|).
+        """
+        size = len(self.graph)
+        if len(self.labels) < size:
+            self.labels.extend([None] * (size - len(self.labels)))
+            self.discovered = QUEUES[self.queue](size)
+        self.generation += 1
+        self.discovered.clear()
+
+    def label(self, index) -> Label:
+        """
+        Function description: Returns the label of the location at index, resetting it if it was last used by an earlier query.
+        """
+        label = self.labels[index]
+        if label is None:
+            label = self.labels[index] = Label(index)
+        if label.stamp != self.generation:
+            label.reset(self.generation)
+        return label
+
+    def previous(self, index):
+        """
+        Function description: The index served before index on its route in the last query, -1 for the source.
+        """
+        return self.labels[index].previous
+
+    def search(self, source, destinations, arcs=None):
+        """
+        Function description: Dijkstra from the location at index source. destinations is a dict from the index of a destination
+        to a key, several indices can share a key (like a destination and its alternate equivalent). Serves locations until
+        every key has had one of its indices served or nothing is left to serve. Returns a dict from key to the label of the
+        first index of that key to be served, which is the closest one because locations are served in order of distance.
+        The labels stay valid until the next query on this context. arcs replaces graph._arcs, for example to search
+        the reversed graph.
+        :Time complexity: O(|R|log(|L|)) for the roads and locations explored
+        :Aux space complexity: O(1) besides the labels that are touched
+        """
+        self.begin()
+        if arcs is None:
+            arcs = self.graph._arcs
+        labels = self.labels
+        generation = self.generation
+        discovered = self.discovered
+        source_label = self.label(source)
+        source_label.distance = 0
+        discovered.add(source_label)
+        keys = len(set(destinations.values()))
+        found = {}
+        while len(discovered) > 0:
+            served = discovered.serve() #O(log(|L|))
+            served.visited = True
+            if served.index in destinations:
+                key = destinations[served.index]
+                if key not in found:
+                    found[key] = served
+                    if len(found) == keys:
+                        break
+
+            for index, weight in arcs(served.index):
+                child = labels[index]
+                if child is None or child.stamp != generation: #Not discovered yet in this query
+                    child = self.label(index)
+                    child.distance = served.distance + weight
+                    child.previous = served.index
+                    discovered.add(child) #O(log(|L|))
+
+                elif child.visited == False:
+                    if child.distance > served.distance + weight:
+                        child.distance = served.distance + weight
+                        child.previous = served.index
+                        discovered.decrease(child) #O(log(|L|))
+        return found
+
+
+class Route(NamedTuple):
+    source: int
+    destination: int
+    cost: float #math.inf if the destination cannot be reached
+    path: list #None if the destination cannot be reached
+
+
+class LayeredGraph:
+    """
+    Queries shared by every form of the two layer carpool graph. A subclass gives its amount of layered locations with len(),
+    the amount of locations in one layer as layer, indexOf(id), _arcs(index), _reverse_arcs(index) (the edges arriving at
+    index) and _location(index) which is the location in the original layer that index stands for.
+    """
+
+    def __init__(self) -> None:
+        self.version = 0 #Goes up whenever the edges change, so anything worked out from them knows it is out of date
+        self.contexts = {} #The SearchContext of each priority queue, see queue_context
+        self.context = self.queue_context("lazy") #Reused by every query that is not given its own context
+        self.reverse_context = SearchContext(self) #The backward half of a bidirectional search
+        self.landmarks = None #(version, landmark indices, distances from each landmark, distances to each landmark)
+        self.cache = None #SPTCache of shortest path trees, see enable_cache
+        self.passenger_layout = None #frozenset of the locations with a passenger link, worked out when first needed
+        self.profiler = None #The Profiler recording the queries, see profile
+
+    def queue_context(self, queue):
+        """
+        Function description: The SearchContext of this graph that uses the priority queue named queue (see QUEUES),
+        created the first time it is asked for.
+        """
+        if queue not in self.contexts:
+            self.contexts[queue] = SearchContext(self, queue)
+        return self.contexts[queue]
+
+    def _source(self, source):
+        """
+        Function description: The index of source, which has to be a location in the original layer.
+        """
+        index = self.indexOf(source)
+        if index is None or index >= self.layer:
+            raise ValueError("Source " + str(source) + " is not a location in the graph.")
+        return index
+
+    def _destinations(self, destination):
+        """
+        Function description: The indices of destination and, if there are passengers, of its alternate equivalent.
+        """
+        destinations = [self.indexOf(destination)]
+        if self.link: #The alternate destination is only reachable with passengers
+            destinations.append(self.indexOf(destination + self.layer))
+        return [index for index in destinations if index is not None]
+
+    def _route(self, previous, index):
+        """
+        Function description: Walks back from index to the source, where previous(index) is the index before index on the
+        route (-1 for the source), and returns the route as locations in the original layer, without the repeat that taking
+        a passenger link would leave in it. The walk is a loop over the previous indices, so the route is built in one pass
+        whatever its length, with no recursion to run into the recursion limit and no list copied per location.
+        :Time complexity: O(|R|)
+        :Aux space complexity: O(|R|)
+        """
+        route = []
+        while index != -1:
+            location = self._location(index)
+            if len(route) == 0 or route[-1] != location:
+                route.append(location)
+            index = previous(index)
+        route.reverse()
+        return route
+
+    def route_many(self, queries, context=None):
+        """
+        Function description: Answers a batch of (source, destination) queries and returns a Route for each, in the same order.
+        Queries that share a source are answered by one search that stops once every one of their destinations is served,
+        instead of one dijkstra per query. Nothing is printed.
+        :Time complexity: O(|S||R|log(|L|)) where |S| is the amount of different sources
+        :Aux space complexity: O(|Q| + |Q||R|) for the queries and their routes
+        """
+        if context is None:
+            context = self.context
+        queries = list(queries)
+        groups = {}
+        for position, (source, destination) in enumerate(queries): #O(|Q|)
+            groups.setdefault(source, []).append(position)
+
+        results = [None] * len(queries)
+        for source, positions in groups.items():
+            source_index = self._source(source)
+            if self.cache is not None: #Every destination is answered by the cached tree of the source
+                tree = self.shortest_path_tree(source, context)
+                for position in positions:
+                    results[position] = tree.route(queries[position][1])
+                continue
+            destinations = {}
+            for position in positions:
+                for index in self._destinations(queries[position][1]):
+                    destinations[index] = queries[position][1]
+            found = context.search(source_index, destinations) #O(|R|log(|L|))
+            for position in positions:
+                destination = queries[position][1]
+                if destination in found:
+                    label = found[destination]
+                    results[position] = Route(source, destination, label.distance, self._route(context.previous, label.index))
+                else:
+                    results[position] = Route(source, destination, math.inf, None)
+        return results
+
+    def cost_matrix(self, sources, targets, context=None):
+        """
+        Function description: The cost of the best route from every location in sources to every location in targets, over
+        both layers, as one list of costs per source in the order of targets (math.inf if unreachable). Every source is one
+        search on the same context that stops once every target is served, and no route is built. If the cache is enabled
+        the costs are read from the shortest path tree of each source instead.
+        :Time complexity: O(|S||R|log(|L|))
+        :Aux space complexity: O(|S||T|) for the matrix
+        """
+        if context is None:
+            context = self.context
+        targets = list(targets)
+        destinations = {}
+        for target in targets: #O(|T|), shared by every search
+            for index in self._destinations(target):
+                destinations[index] = target
+        matrix = []
+        for source in sources:
+            if self.cache is not None: #The cached tree of the source has the distance of every target
+                tree = self.shortest_path_tree(source, context)
+                matrix.append([min((tree.distances[index] for index in self._destinations(target)), default=math.inf)
+                               for target in targets])
+                continue
+            found = context.search(self._source(source), destinations) #O(|R|log(|L|))
+            matrix.append([found[target].distance if target in found else math.inf for target in targets])
+        return matrix
+
+    def passengers(self):
+        """
+        Function description: The frozenset of locations with a passenger link, which together with the roads decides every route.
+        Worked out once and kept until the passenger links change.
+        """
+        if self.passenger_layout is None:
+            self.passenger_layout = frozenset(self._passengers())
+        return self.passenger_layout
+
+    def add_passengers(self, locations) -> int:
+        """
+        Function description: Gives every location in locations a passenger link to its alternate equivalent, like can_link
+        does when the graph is made, without rebuilding anything. Returns how many locations did not have one yet.
+        Cached shortest path trees stay in the cache, they are keyed by the passengers so they are used again if the
+        passengers come back to what they were. The landmarks of "alt" mode are dropped if anything changed.
+        :Time complexity: O(|C|) for |C| locations, plus the degree of each one for Graph
+        :Aux space complexity: O(1)
+        """
+        return self._update_passengers(locations, True)
+
+    def remove_passengers(self, locations) -> int:
+        """
+        Function description: Takes the passenger link away from every location in locations, the opposite of add_passengers.
+        Returns how many locations had one.
+        :Time complexity: O(|C|) for |C| locations, plus the degree of each one for Graph
+        :Aux space complexity: O(1)
+        """
+        return self._update_passengers(locations, False)
+
+    def _update_passengers(self, locations, linked):
+        changed = 0
+        for location in locations:
+            index = self.indexOf(location)
+            if index is None or index >= self.layer:
+                raise ValueError("Passenger " + str(location) + " is not a location in the graph.")
+            if self._set_link(index, linked):
+                changed += 1
+        if changed > 0:
+            self.passenger_layout = None
+            self.landmarks = None #Distances to and from the landmarks change with the links, so the bounds would be wrong
+        return changed
+
+    def update_weight(self, u, v, w1, w2) -> None:
+        """
+        Function description: Changes the weights of the road from u to v to w1 in the original layer and w2 in the alternate
+        layer, in place. See update_weights.
+        """
+        self.update_weights([(u, v, w1, w2)])
+
+    def update_weights(self, changes) -> None:
+        """
+        Function description: Changes the weights of every road in changes, given as (u,v,w1,w2) tuples like addTuple, in place.
+        If there are several roads from u to v they all get the new weights. Raises ValueError if there is no road from u
+        to v or a weight is negative. The landmarks of "alt" mode are dropped. Cached shortest path trees are repaired once
+        for the whole batch if the cache is dynamic (see enable_cache) and they were made with the passengers there are now,
+        the rest are dropped.
+        :Time complexity: O(|C|) for |C| changes, plus the degree of u for Graph, plus the repairs
+        :Aux space complexity: O(|C|)
+        """
+        arcs = {} #(index, index) to the new weight, a road changed twice in the batch ends with its last weights
+        try:
+            for u, v, w1, w2 in changes:
+                if w1 < 0 or w2 < 0:
+                    raise ValueError("Weights of the road from " + str(u) + " to " + str(v) + " should not be negative.")
+                start = self.indexOf(u)
+                end = self.indexOf(v)
+                if start is None or end is None or start >= self.layer or end >= self.layer:
+                    raise ValueError("There is no road from " + str(u) + " to " + str(v) + ".")
+                self._set_weights(start, end, w1, w2)
+                arcs[start, end] = w1
+                arcs[start + self.layer, end + self.layer] = w2
+        finally: #The changes made before a bad one stay, so what depends on them has to follow
+            if len(arcs) > 0:
+                self.landmarks = None
+                if self.cache is not None:
+                    if self.cache.dynamic and self.cache.version == self.version:
+                        passengers = self.passengers()
+                        for key, tree in list(self.cache.trees.items()):
+                            if key[1] == passengers:
+                                tree.repair([(a, b, weight) for (a, b), weight in arcs.items()])
+                            else: #Repairs follow the links there are now, so a tree of other passengers would go stale
+                                self.cache.discard(key)
+                    else: #A tree of an older version misses roads the graph has now, repairs can not bring it back
+                        self.cache.invalidate()
+
+    def enable_cache(self, maxsize=128, dynamic=False):
+        """
+        Function description: Makes dijkstra and route_many (and route in "dijkstra" mode) answer from shortest path trees
+        kept in an SPTCache of up to maxsize trees, keyed by the source and the passenger links. A source that has been
+        queried before with the same passengers costs O(|R|) for its route instead of a search. Returns the cache so its
+        counters can be read. Every tree is dropped when addTuple, addEdge or addVertex change the graph. When weights
+        change through update_weights they are dropped too, unless dynamic is true, in which case the trees of the passengers
+        there are now are repaired (only those, the others are still dropped) as long as the graph has not changed otherwise
+        since they were made.
+        """
+        self.cache = SPTCache(maxsize, dynamic)
+        return self.cache
+
+    def shortest_path_tree(self, source, context=None):
+        """
+        Function description: The ShortestPathTree of every location reachable from source, from the cache if it is enabled
+        and has it, otherwise by searching until nothing is left to serve.
+        :Time complexity: O(|R|log(|L|)) for a search, O(1) from the cache
+        :Aux space complexity: O(|L|) for the tree
+        """
+        if context is None:
+            context = self.context
+        source_index = self._source(source)
+        key = (source_index, self.passengers())
+        if self.cache is not None:
+            tree = self.cache.get(key, self.version)
+            if tree is not None:
+                return tree
+        context.search(source_index, {})
+        distances = [math.inf] * len(self)
+        previous = array('q', [-1]) * len(self)
+        for label in context.labels: #O(|L|)
+            if label is not None and label.stamp == context.generation:
+                distances[label.index] = label.distance
+                previous[label.index] = label.previous
+        tree = ShortestPathTree(self, source, distances, previous)
+        if self.cache is not None:
+            self.cache.put(key, tree)
+        return tree
+
+    #Worst case is O(Elog(V)) because in worst case, every vertices is visited
+                                            # which results in E edges visited.
+    def dijkstra(self, source, destination, context=None, queue=None):
+        """
+        Function description: A function used to find the optimal route from source to destination.
+                              Compared to a normal dijkstra algorithm, since there are 2 * (orignal number of locations) unless there are no passengers.
+                               
+                              If there are passengers, the first half of the locations will represent the distance and route to the destination
+                              if there are no extra passengers and the second half of the locations represents the distance and route to the destination 
+                              if there are extra passengers. Therefore comparing the 2 destinations to see which
+                              distance is the best and returning the favourable route to get to the best distance.
+                              
+                              If there are no passengers, then self.link is false because there are no passengers
+                              and will find the shortest path towards the destination without any comparison to
+                              anything else.
+
+                              The search itself runs on context, or on self.context if no context is given. Pass a
+                              SearchContext(graph) of your own to search the same graph from several places at once.
+                              queue picks the priority queue of the search by name (see QUEUES) when no context is given.
+                              
+        Approach description:
+        :Input:
+        source: Starting location from the set {0,1...L-1} where L is total locations
+        destination: Ending location from the set {0,1...L-1} where L is total locations
+        context: Optional SearchContext of this graph
+        queue: Optional name of the priority queue, "lazy" (LazyHeap) by default
+        
+        :Output:
+        A path represented by a list so for example [0,1,2,1] represents going from location 0 to location 1
+        to location 2 and back to location 1. None if the destination cannot be reached.
+        
+        :Time complexity:
+        context.search(): O(|R|log(|L|)) because every road explored may rise a location in the heap which is O(log(|L|)).
+                          Starting the query is O(1) because only the labels the query touches are reset.
+        self._route(): O(|R|) because it walks the previous index of each location on the route back to the source once,
+                       folding alternate locations into the original layer and skipping repeats on the way
+        Therefore this algorithm takes O(|R|log(|L|))
+                                                     
+        :Aux space complexity:
+        context: O(|L|) but it is allocated once and reused by every query
+        route: O(|R|) because the route can never have more than |R| locations
+        Therefore the aux space complexity of a query is O(|R|)
+        """
+        if self.cache is not None and context is None and queue is None:
+            route = self.shortest_path_tree(source).route(destination)
+            if route.path is not None:
+                print(route.cost)
+            return route.path
+        if context is None:
+            context = self.context if queue is None else self.queue_context(queue)
+        source_index = self._source(source)
+        destinations = self._destinations(destination)
+
+        found = context.search(source_index, {index: index for index in destinations}) #O(|R|log(|L|))
+        if len(found) == 0:
+            return None
+        best_vertex = next(iter(found.values())) #Served in order of distance so the first destination served is the best
+        route = self._route(context.previous, best_vertex.index) #O(|R|)
+        print(best_vertex.distance)
+        return route
+
+    def profile(self, sink=None):
+        """
+        Function description: A Profiler to use in a with statement, which records a QueryStats for every query made on this
+        graph inside it. The graph and its contexts are only changed inside the with statement, so queries outside of it
+        cost exactly what they would without a profiler.
+        """
+        return Profiler(self, sink)
+
+    def route(self, source, destination, mode="dijkstra"):
+        """
+        Function description: Returns the best Route from source to destination over both layers, like dijkstra but without
+        printing. mode chooses the search:
+        "dijkstra": the search dijkstra uses, stopping at the first copy of the destination served.
+        "bidirectional": searches forward from the source and backward from both copies of the destination at once,
+                         stopping once the two searches cannot find a shorter route than the best meeting found.
+        "alt": A* towards both copies of the destination, with lower bounds from landmarks (see prepare_landmarks).
+               The landmarks are prepared on first use and again whenever the edges have changed.
+        :Time complexity: O(|R|log(|L|)) in every mode, but the other modes usually serve far fewer locations
+        :Aux space complexity: O(|R|) for the route besides the contexts
+        """
+        source_index = self._source(source)
+        destinations = self._destinations(destination)
+        if mode == "dijkstra":
+            return self.route_many([(source, destination)])[0]
+        elif mode == "bidirectional":
+            cost, path = self._bidirectional(source_index, destinations)
+        elif mode == "alt":
+            if self.landmarks is None or self.landmarks[0] != self.version:
+                self.prepare_landmarks()
+            cost, path = self._alt(source_index, destinations)
+        else:
+            raise ValueError("Unknown mode " + str(mode) + ".")
+        return Route(source, destination, cost, path)
+
+    def _bidirectional(self, source, destinations):
+        """
+        Function description: Dijkstra forward from source on self.context and backward from every index in destinations on
+        self.reverse_context, always serving from the side whose next location is closer. Whenever an edge joins a location
+        reached forward to one reached backward, the route through it is a candidate. Once the closest locations left on both
+        sides add up to at least the best candidate, no route through an unserved location can be shorter.
+        Returns (cost, route) or (math.inf, None).
+        :Time complexity: O(|R|log(|L|))
+        :Aux space complexity: O(|R|) for the route besides the contexts
+        """
+        contexts = (self.context, self.reverse_context)
+        arcs = (self._arcs, self._reverse_arcs)
+        for context in contexts:
+            context.begin()
+        start = self.context.label(source)
+        start.distance = 0
+        self.context.discovered.add(start)
+        for index in destinations:
+            end = self.reverse_context.label(index)
+            end.distance = 0
+            self.reverse_context.discovered.add(end)
+
+        best = math.inf
+        meeting = None #(index reached forward, index reached backward) joined by an edge or the same location
+        if source in destinations:
+            best = 0
+            meeting = (source, source)
+        forward, backward = contexts
+        while len(forward.discovered) > 0 and len(backward.discovered) > 0:
+            closest = (forward.discovered.peek().distance, backward.discovered.peek().distance)
+            if closest[0] + closest[1] >= best:
+                break
+            side = 0 if closest[0] <= closest[1] else 1
+            this = contexts[side]
+            other = contexts[1 - side]
+            served = this.discovered.serve() #O(log(|L|))
+            served.visited = True
+            for index, weight in arcs[side](served.index):
+                child = this.labels[index]
+                if child is None or child.stamp != this.generation:
+                    child = this.label(index)
+                    child.distance = served.distance + weight
+                    child.previous = served.index
+                    this.discovered.add(child)
+                elif child.visited == False and child.distance > served.distance + weight:
+                    child.distance = served.distance + weight
+                    child.previous = served.index
+                    this.discovered.decrease(child)
+
+                reached = other.labels[index]
+                if reached is not None and reached.stamp == other.generation:
+                    if served.distance + weight + reached.distance < best:
+                        best = served.distance + weight + reached.distance
+                        meeting = (served.index, index) if side == 0 else (index, served.index)
+
+        if meeting is None:
+            return math.inf, None
+        route = self._route(forward.previous, meeting[0])
+        rest = self._route(backward.previous, meeting[1]) #From the destination back to the meeting
+        rest.reverse()
+        if route[-1] == rest[0]:
+            rest.pop(0)
+        return best, route + rest
+
+    def _distances(self, context, source, arcs):
+        """
+        Function description: The distance from source (to source if arcs are the reverse arcs) of every index, math.inf if unreachable.
+        :Time complexity: O(|R|log(|L|))
+        :Aux space complexity: O(|L|)
+        """
+        context.search(source, {}, arcs)
+        distances = [math.inf] * len(self)
+        for label in context.labels:
+            if label is not None and label.stamp == context.generation:
+                distances[label.index] = label.distance
+        return distances
+
+    def prepare_landmarks(self, count=4):
+        """
+        Function description: Picks up to count landmarks and works out the distance from and to each of them for every location
+        in both layers. The first landmark is the location farthest from the first location and every next one is the
+        location farthest from the landmarks picked so far, so that they end up around the edge of the graph.
+        By the triangle inequality d(v,t) >= d(l,t) - d(l,v) and d(v,t) >= d(v,l) - d(t,l) for every landmark l, which is
+        the lower bound that route(mode="alt") uses.
+        :Time complexity: O(count * |R|log(|L|))
+        :Aux space complexity: O(count * |L|)
+        """
+        context = self.context #Every distance is copied out before the next search, and a profiler counts what it does
+        indices = []
+        distances_from = []
+        distances_to = []
+        closest = self._distances(context, 0, self._arcs) if len(self) > 0 else []
+        while len(indices) < count:
+            candidates = [index for index in range(len(closest)) if closest[index] != math.inf and index not in indices]
+            if len(candidates) == 0:
+                break
+            landmark = max(candidates, key=lambda index: closest[index])
+            indices.append(landmark)
+            distances_from.append(self._distances(context, landmark, self._arcs))
+            distances_to.append(self._distances(context, landmark, self._reverse_arcs))
+            if len(indices) == 1:
+                closest = distances_from[0]
+            else:
+                closest = [min(a, b) for a, b in zip(closest, distances_from[-1])]
+        self.landmarks = (self.version, indices, distances_from, distances_to)
+
+    def _alt(self, source, destinations):
+        """
+        Function description: A* from source towards the closest index in destinations. The lower bound of a location is the
+        smallest over the destinations of the largest landmark bound, and is math.inf if a landmark shows that no destination
+        can be reached from it, so it is never discovered. The search is dijkstra on the reduced weights
+        weight + bound(child) - bound(served), which are never negative because the bounds are consistent, so the
+        first destination served is the closest. Returns (cost, route) or (math.inf, None).
+        :Time complexity: O(|R|log(|L|))
+        :Aux space complexity: O(|L|) for the bounds of the locations touched
+        """
+        _, _, distances_from, distances_to = self.landmarks
+        bounds = {}
+
+        def bound(index):
+            if index not in bounds:
+                best = math.inf
+                for target in destinations:
+                    lower = 0
+                    for d_from, d_to in zip(distances_from, distances_to):
+                        if d_from[index] != math.inf:
+                            lower = max(lower, d_from[target] - d_from[index])
+                        if d_to[target] != math.inf:
+                            lower = max(lower, d_to[index] - d_to[target])
+                    best = min(best, lower)
+                bounds[index] = best
+            return bounds[index]
+
+        def reduced_arcs(index):
+            served = bound(index)
+            return [(child, weight + bound(child) - served) for child, weight in self._arcs(index) if bound(child) != math.inf]
+
+        if bound(source) == math.inf:
+            return math.inf, None
+        found = self.context.search(source, {index: 0 for index in destinations}, reduced_arcs)
+        if len(found) == 0:
+            return math.inf, None
+        label = found[0]
+        return label.distance + bound(source), self._route(self.context.previous, label.index)
+
+
+class ShortestPathTree:
+    def __init__(self, graph, source, distances, previous) -> None:
+        """
+        Function description: The distance from source and the index before it on its route (-1 if none) of every index of graph,
+        from a search that served everything reachable, so any destination can be answered without searching again.
+        """
+        self.graph = graph
+        self.source = source
+        self.distances = distances
+        self.previous = previous
+
+    def route(self, destination) -> Route:
+        """
+        Function description: The best Route to destination over both layers, the same one dijkstra finds.
+        :Time complexity: O(|R|)
+        """
+        best = None
+        for index in self.graph._destinations(destination):
+            if self.distances[index] != math.inf and (best is None or self.distances[index] < self.distances[best]):
+                best = index
+        if best is None:
+            return Route(self.source, destination, math.inf, None)
+        return Route(self.source, destination, self.distances[best], self.graph._route(self.previous.__getitem__, best))
+
+    def repair(self, arcs) -> None:
+        """
+        Function description: Brings the tree up to date after the weights of arcs, given as (index, index, new weight), changed
+        in the graph. Every index below an arc on the tree that got longer loses its distance and takes the best one offered by
+        an index that kept its own, then a search from those indices and from the ends of the arcs that got shorter passes the
+        new distances on. Only the indices whose distance or route changes, and their neighbours, are ever looked at.
+        :Time complexity: O(|A|log(|A|)) where A is the affected edges, O(|R|log(|L|)) at worst
+        :Aux space complexity: O(|A|)
+        """
+        distances = self.distances
+        previous = self.previous
+        graph = self.graph
+        affected = []
+        for a, b, weight in arcs: #The subtrees hanging from arcs that got longer
+            if previous[b] == a and distances[a] + weight > distances[b] and distances[b] != math.inf:
+                distances[b] = math.inf
+                affected.append(b)
+        at = 0
+        while at < len(affected): #Their children are among the ends of their edges
+            index = affected[at]
+            at += 1
+            for child, _ in graph._arcs(index):
+                if previous[child] == index and distances[child] != math.inf:
+                    distances[child] = math.inf
+                    affected.append(child)
+        queue = []
+        for index in affected: #Best distance offered by an index not in the subtrees
+            previous[index] = -1
+            for parent, weight in graph._reverse_arcs(index):
+                if distances[parent] + weight < distances[index]:
+                    distances[index] = distances[parent] + weight
+                    previous[index] = parent
+            if distances[index] != math.inf:
+                heapq.heappush(queue, (distances[index], index))
+        for a, b, weight in arcs: #Arcs that got shorter
+            if distances[a] + weight < distances[b]:
+                distances[b] = distances[a] + weight
+                previous[b] = a
+                heapq.heappush(queue, (distances[b], b))
+        while len(queue) > 0:
+            distance, index = heapq.heappop(queue)
+            if distance > distances[index]: #Already served at a better distance
+                continue
+            for child, weight in graph._arcs(index):
+                if distance + weight < distances[child]:
+                    distances[child] = distance + weight
+                    previous[child] = index
+                    heapq.heappush(queue, (distances[child], child))
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int #Trees dropped to make room for a new one
+    invalidations: int #Times every tree was dropped because the graph changed
+    size: int
+    maxsize: int
+
+
+class SPTCache:
+    def __init__(self, maxsize=128, dynamic=False) -> None:
+        """
+        Function description: Keeps up to maxsize shortest path trees and drops the least recently used one to make room.
+        Every tree belongs to one version of the graph, they are all dropped as soon as a different version asks.
+        If dynamic, the graph repairs the trees when weights change instead of calling invalidate.
+        """
+        if maxsize <= 0:
+            raise ValueError("Cache size should be larger than 0.")
+        self.maxsize = maxsize
+        self.dynamic = dynamic
+        self.trees = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self.trees)
+
+    def get(self, key, version):
+        """
+        Function description: The tree of key or None, counting a hit or a miss. O(1)
+        """
+        if version != self.version:
+            self.invalidate()
+            self.version = version
+        tree = self.trees.get(key)
+        if tree is None:
+            self.misses += 1
+            return None
+        self.trees.move_to_end(key)
+        self.hits += 1
+        return tree
+
+    def put(self, key, tree) -> None:
+        """
+        Function description: Keeps tree for key, which must have just missed in get, dropping the least recently used tree if full. O(1)
+        """
+        self.trees[key] = tree
+        if len(self.trees) > self.maxsize:
+            self.trees.popitem(last=False)
+            self.evictions += 1
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.evictions, self.invalidations, len(self.trees), self.maxsize)
+
+    def clear(self) -> None:
+        self.trees.clear()
+
+    def discard(self, key) -> None:
+        self.trees.pop(key, None)
+
+    def invalidate(self) -> None:
+        """
+        Function description: Drops every tree because the graph changed under them.
+        """
+        if len(self.trees) > 0:
+            self.invalidations += 1
+        self.trees.clear()
+
+
+class QueryStats:
+    __slots__ = ("query", "settled", "relaxed", "pushes", "decreases", "lookups", "find_vertex", "peak_heap",
+                 "reset_time", "backtrack_time", "time")
+
+    def __init__(self, query=None) -> None:
+        """
+        Function description: What one query did, recorded by a Profiler. query is the name of the method called,
+        settled the locations served, relaxed the edges looked at, pushes and decreases the adds and decreases on the heap,
+        lookups the calls to indexOf, find_vertex the calls to findVertex and peak_heap the most locations in the heap at once.
+        reset_time is the seconds spent starting searches and resetting labels, backtrack_time the seconds spent walking
+        routes back and time the seconds of the whole query.
+        """
+        self.query = query
+        self.settled = 0
+        self.relaxed = 0
+        self.pushes = 0
+        self.decreases = 0
+        self.lookups = 0
+        self.find_vertex = 0
+        self.peak_heap = 0
+        self.reset_time = 0.0
+        self.backtrack_time = 0.0
+        self.time = 0.0
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return "QueryStats(" + ", ".join(name + "=" + repr(getattr(self, name)) for name in self.__slots__) + ")"
+
+
+class CountingQueue:
+    def __init__(self, queue, profiler) -> None:
+        """
+        Function description: Passes everything on to queue, counting the adds, decreases and serves and the most elements in
+        queue at once into the QueryStats of the query profiler is recording.
+        """
+        self.queue = queue
+        self.profiler = profiler
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def clear(self) -> None:
+        self.queue.clear()
+
+    def add(self, element):
+        stats = self.profiler.current
+        stats.pushes += 1
+        added = self.queue.add(element)
+        if len(self.queue) > stats.peak_heap:
+            stats.peak_heap = len(self.queue)
+        return added
+
+    def decrease(self, element) -> None:
+        self.profiler.current.decreases += 1
+        self.queue.decrease(element)
+
+    def peek(self):
+        return self.queue.peek()
+
+    def serve(self):
+        self.profiler.current.settled += 1
+        return self.queue.serve()
+
+
+class Profiler:
+    QUERIES = ("dijkstra", "route", "route_many", "cost_matrix", "shortest_path_tree", "prepare_landmarks")
+
+    def __init__(self, graph, sink=None) -> None:
+        """
+        Function description: Records a QueryStats for every call to one of QUERIES on graph, a call made by another one of
+        them being part of the same query. Every QueryStats is given to sink, a callable, or appended to stats if there is
+        no sink. While in a with statement the methods of graph that queries go through, and those of its SearchContexts,
+        are shadowed by counting and timing wrappers. Leaving it takes them away again, so nothing is counted or timed
+        outside of it. A SearchContext passed to a query is only counted if it belongs to graph. Entering a profiler on a
+        graph another profiler is recording raises ValueError.
+        """
+        self.graph = graph
+        self.sink = sink
+        self.stats = []
+        self.current = QueryStats() #Counts anything done outside a query, thrown away when the next query starts
+        self.depth = 0
+        self.contexts = []
+
+    def __enter__(self):
+        graph = self.graph
+        if graph.profiler is not None:
+            raise ValueError("The graph is already being profiled, a second profiler would count everything twice.")
+        graph.profiler = self
+        for name in self.QUERIES:
+            setattr(graph, name, self._query(name, getattr(graph, name)))
+        graph._arcs = self._relaxing(graph._arcs)
+        graph._reverse_arcs = self._relaxing(graph._reverse_arcs)
+        graph._route = self._timed("backtrack_time", graph._route)
+        graph.indexOf = self._counting("lookups", graph.indexOf)
+        if hasattr(graph, "findVertex"):
+            graph.findVertex = self._counting("find_vertex", graph.findVertex)
+        queue_context = graph.queue_context
+
+        def instrumented_queue_context(queue):
+            context = queue_context(queue)
+            if context not in self.contexts:
+                self._instrument(context)
+            return context
+        graph.queue_context = instrumented_queue_context
+        for context in list(graph.contexts.values()) + [graph.reverse_context]:
+            self._instrument(context)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        shadowed = vars(self.graph)
+        for name in self.QUERIES + ("_arcs", "_reverse_arcs", "_route", "indexOf", "findVertex", "queue_context"):
+            shadowed.pop(name, None)
+        for context in self.contexts:
+            vars(context).pop("begin", None)
+            vars(context).pop("label", None)
+            if isinstance(context.discovered, CountingQueue):
+                context.discovered = context.discovered.queue
+        self.contexts.clear()
+        self.graph.profiler = None
+
+    def _query(self, name, method):
+        def query(*args, **kwargs):
+            if self.depth > 0: #Part of the query that called it
+                return method(*args, **kwargs)
+            self.current = QueryStats(name)
+            self.depth += 1
+            begin = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.depth -= 1
+                stats = self.current
+                stats.time = time.perf_counter() - begin
+                self.current = QueryStats()
+                if self.sink is None:
+                    self.stats.append(stats)
+                else:
+                    self.sink(stats)
+        return query
+
+    def _relaxing(self, arcs):
+        def relaxing(index):
+            found = arcs(index)
+            self.current.relaxed += len(found)
+            return found
+        return relaxing
+
+    def _counting(self, counter, method):
+        def counting(*args, **kwargs):
+            stats = self.current
+            setattr(stats, counter, getattr(stats, counter) + 1)
+            return method(*args, **kwargs)
+        return counting
+
+    def _timed(self, timer, method):
+        def timed(*args, **kwargs):
+            begin = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats = self.current
+                setattr(stats, timer, getattr(stats, timer) + time.perf_counter() - begin)
+        return timed
+
+    def _instrument(self, context) -> None:
+        """
+        Function description: Shadows begin so the heap of context is counted and the time starting a search is kept, and label
+        so the time resetting labels is kept.
+        """
+        begin = context.begin
+        label = self._timed("reset_time", context.label)
+
+        def counted_begin():
+            start = time.perf_counter()
+            begin()
+            if not isinstance(context.discovered, CountingQueue): #begin makes a new heap when the graph has grown
+                context.discovered = CountingQueue(context.discovered, self)
+            self.current.reset_time += time.perf_counter() - start
+        context.begin = counted_begin
+        context.label = label
+        self.contexts.append(context)
+
+
+class Graph(LayeredGraph):
     def __init__(self,start, V, passengers, min_element,end) -> None:
         """
         Function description: Constructor in the graph class. When this object is created initially,
@@ -158,31 +1252,36 @@ class Graph:
         with the alternate equivalent of the location with passengers which is (passenger location + V//2).
         :Time complexity:
         self.vertices: O(|L|) because we extend the original list by V times
-        self.link: O(|P|log(|L|)) because we perform an addEdge function which is O(log(|L|))
+        self.link: O(|P|) because we perform an addEdge function which is O(1)
                    time complexity |P| times.
         First for loop (for i in range(V)): O(|L|) because we are replacing all the None with the vertex object and there are V amount of None
         
         In the worst case, the maximum amount of passengers possible is V-2, so |P| = O(V).
-        Hence O(|L| + |P| + |L| + |L|log(|L|)) so O(|L|log(|L|))
+        Hence O(|L| + |P| + |L| + |L|) so O(|L|)
         :Aux space complexity:
         self.vertices = O(|L|) because self.vertices will have 2 * |L|
         The other variables are O(1), excluding the input
         So worst case aux space complexity is O(|L|)
         """
+        super().__init__()
         self.vertices = [None] * V #O(2V)
         self.link = False
+        self.min_element = min_element
+        self.index = None #None while the ids are contiguous from min_element, otherwise a dict from id to position
+        self.reverse = None #(version, edges arriving at every vertex) built the first time they are needed
+        self.linked = set() #Locations can_link gave a passenger link
 
         for i in range(V): # O(2V)
             self.vertices[i] = Vertex(i+min_element)
         self.link = self.can_link(passengers,start,end) #O(P)
 
             
-    def can_link(self, passengers, start,end): #O(|P|log(|L|))
+    def can_link(self, passengers, start,end): #O(|P|)
         """
         Function description: Takes in passengers which is a list of locations with passengers, start which is starting location
         and end which is the destination. Outputs true if one of the locations are valid to have passengers. For every valid passenger,
-        add an edge. Time complexity is O(|P|log(|L|)) because if all locations are valid, then the addEdge function
-        which runs O(log(|L|)) runs |P| times so O(|P|log(|L|)). The aux space complexity is O(P) because an edge
+        add an edge. Time complexity is O(|P|) because if all locations are valid, then the addEdge function
+        which runs O(1) runs |P| times so O(|P|). The aux space complexity is O(P) because an edge
         is added to each valid passenger location. 
         """
         output = False
@@ -190,201 +1289,205 @@ class Graph:
             for vertex in passengers:
                 if (vertex != start or vertex != end) and vertex < (len(self.vertices)//2): #Check if passenger is start or end
                     self.addEdge(vertex,int(vertex + (len(self.vertices)/2)),0)             #Also check if only in original locations, not alternate
+                    self.linked.add(vertex)
+                    self.passenger_layout = None
                     output = True
         return output                                                                      
                     
 
 
             
-    def findVertex(self, key, low, high): #Taken from https://www.programiz.com/dsa/binary-search
-        #O(log(V))
-        if high >= low:
-
-            mid = low + (high - low)//2
-            # If found at mid, then return it
-            if self.vertices[mid].id == key:
-                return self.vertices[mid]
-
-            # Search the left half
-            elif self.vertices[mid].id > key:
-                return self.findVertex(key, low, mid-1)
+    def indexOf(self, key): #O(1)
+        """
+        Function description: Returns the position of the location key in self.vertices or None if it is not in the graph.
+        While the ids are contiguous from min_element the position is just an offset, once addVertex breaks that
+        a dict from id to position is used instead. Time complexity is O(1) and the aux space complexity is O(1).
+        """
+        if self.index is None:
+            index = key - self.min_element
+            if 0 <= index < len(self.vertices):
+                return index
+            return None
+        return self.index.get(key)
 
-            # Search the right half
-            else:
-                return self.findVertex(key, mid + 1, high)
-        else:
+    def findVertex(self, key, low=0, high=None): #O(1)
+        """
+        Function description: Returns the vertex with the id key if its position is between low and high, otherwise "Not found".
+        Time complexity is O(1) because of indexOf, the aux space complexity is O(1).
+        """
+        index = self.indexOf(key)
+        if index is None or index < low or (high is not None and index > high):
             return "Not found"
+        return self.vertices[index]
             
     def addEdge(self,source,destination,weight):
         """
         Function description: A function when given the source, destination and weight,
-        will append the edge to the vertex. Time complexity is O(log(|L|)) due to find_vertex
+        will append the edge to the vertex. Time complexity is O(1) due to indexOf
         function. The aux space complexity is O(1) because only 1 edge classes are appended to an
         already existing list.
         """
-        start = self.findVertex(source,0,len(self.vertices)-1)
-        
-        end = self.findVertex(destination,0,len(self.vertices)-1)
-        if start.id == source and end.id == destination:
-            start.edges.append(Edge(source,destination,weight))        
+        start = self.indexOf(source)
+        end = self.indexOf(destination)
+        if start is not None and end is not None:
+            self.vertices[start].edges.append(Edge(source,destination,weight,end))
+            self.version += 1
             
-    def addTuple(self, tuple: tuple, V: int): # O(2logV) so just O(logV),
+    def addTuple(self, tuple: tuple, V: int): # O(1)
         """
         Function description: A function that when given a tuple in the form
         (u,v,w1,w2) where u is source, v is destination, w1 is one of the weight
         which is only travelled if no extra passengers and w2 is the other weight
         where it is travelled if have extra passengers. V is the amount of locations.
         Two edges will be appended to the original vertex and the alternate equivalent.
-        The time complexity is O(log(|L|)) due to find_vertex function, the aux space complexity is O(1) because
+        The time complexity is O(1) due to indexOf function, the aux space complexity is O(1) because
         2 edge classes are appended and other than that, no other data structures
         were created.
         """
  
-        start = self.findVertex(tuple[0],0,len(self.vertices)-1)
-        end = self.findVertex(tuple[1],0,len(self.vertices)-1) 
-        if start.id == tuple[0] and end.id == tuple[1]:
+        start = self.indexOf(tuple[0])
+        end = self.indexOf(tuple[1])
+        if start is not None and end is not None:
             for i in range(2):
-                start = self.findVertex(tuple[0] + (i * V),0,len(self.vertices)-1) #O(logV)
-                start.edges.append(Edge(tuple[0] + (i * V),tuple[1] + (i * V),tuple[2+i]))
+                start = self.indexOf(tuple[0] + (i * V)) #O(1)
+                end = self.indexOf(tuple[1] + (i * V))
+                self.vertices[start].edges.append(Edge(tuple[0] + (i * V),tuple[1] + (i * V),tuple[2+i],end))
+            self.version += 1
                 
-    #Worst case is O(Elog(V)) because in worst case, every vertices is visited
-                                            # which results in E edges visited.
-    def dijkstra(self, source, destination):
+    def _arcs(self, index):
         """
-        Function description: A function used to find the optimal route from source to destination.
-                              Compared to a normal dijkstra algorithm, since there are 2 * (orignal number of locations) unless there are no passengers.
-                               
-                              If there are passengers, the first half of the locations will represent the distance and route to the destination
-                              if there are no extra passengers and the second half of the locations represents the distance and route to the destination 
-                              if there are extra passengers. Therefore comparing the 2 destinations to see which
-                              distance is the best and returning the favourable route to get to the best distance.
-                              
-                              If there are no passengers, then self.link is false because there are no passengers
-                              and will find the shortest path towards the destination without any comparison to
-                              anything else.
-                              
-        Approach description:
-        :Input:
-        source: Starting location from the set {0,1...L-1} where L is total locations
-        destination: Ending location from the set {0,1...L-1} where L is total locations
-        
-        :Output:
-        A path represented by a list so for example [0,1,2,1] represents going from location 0 to location 1
-        to location 2 and back to location 1.
-        
-        :Time complexity:
-        Adding the source to the heap called discovered: O(|1|) because no rises ever occur
-        While loop: Runs O(|L|) time complexity because all locations can be met twice
-        Variable called served: O(|L|log(|L|)) because of the sink operation which is O(log(|L|)) running O(|L|) times
-        return_statement: At worst, backtracking to the source node totalling up to |R| so O(|R|) and findvertex function
-                               is O(log(|L|)) but is ran |R| times so in total is O(|R|log(|L|))
-        Second for loop (for vertex in self.vertices:): O(|L|) because I am resetting all the properties for each location
-        Third for loop (for t in range(len(return_statement))): O(|E|) because return_statement variable can never go beyond a length of 2 * |E|
-        Fourth for loop (for p in range(len(return_statement))): O(|E|) because return_statement variable can never go beyond a length of 2 * |E|
-        Fifth for loop (Finding adjacent locations): O(|L|^2) because at most the original destination and alternate destination will have |L|-1 neighbours but
-                                                     since that it is running O(|L|) times so O(|L|^2)
-        discovered.add(): O(|L|^2log(|L|)) worst case when a location will have |L|-1 neighbours and adds all these
-                        neighbours which takes O(log(|L|)) because of the rise operation running O(|L^2|) times
-                        because of the fifth for loop.
-        discovered.rise(): O(|L|^2log(|L|)) worst case when there are approximately |L| locations and the rise takes
-                          O(log(|L|)). However, it is running O(|L^2|) times because of the fifth for loop thus it will
-                          be O(|L|^2log(|L|))
-                          
-        In total, it will be O(1 + |L| + |L|log(|L|) + |L| + |L|+ |L| + |L|^2 + |L|^2log(|L|) + |L|^2log(|L|))
-        The highest order is O(|L|^2log(|L|)) and since that the edges represents roads, the maximum amount of roads
-        is O(|L|^2) so O(|R|) = O(|L|^2). Therefore this algorithm takes O(|R|log(|L|))
-                                                     
-        :Aux space complexity:
-        visited_vertices: O(|L|) because at most, 2 * |L| are visited
-        discovered: O(|L|) because less than 2*L will be added to discovered
-        return_statement: O(|R|) because backtracking function can add to the list a total of |R| times
-        true_return: Same as return_statement
-        served.previous: O(1)
-        child.previous: Same as served.previous
-        served.edges: Worst case is where all stored adjacent edges are used to loop so O(|R|)
-        
-        In total is O(|L| + |L| + |L| + |L| + |L| + |R|)
-        Therefore the aux space complexity is O(|L| + |R|)
+        Function description: The (position of destination, weight) of every edge leaving the vertex at index, used by SearchContext.
         """
-        
-        def backtracking(vertex): #OElogV (Explained in the dijkstra documentation)
-            if vertex.previous == None:
-                return []
-            return backtracking(self.findVertex(vertex.previous,0,len(self.vertices)-1)) + [vertex.previous]
+        return [(edge.index, edge.weight) for edge in self.vertices[index].edges]
 
-        
-        source_vertex = self.findVertex(source,0,len(self.vertices)-1)
-        source_vertex.discovered = True
-        source_vertex.distance = 0
-        visited_vertices = [] # O(V)
-        discovered = Heap2(len(self.vertices) * 2) # O(V)
-        discovered.add(source_vertex)
-        count = 0
-        best = 0 #Best distance for destination
-        best_vertex = 0 #Best vertex to choose for destination
-        return_statement = [] # O(V), is equivalent to worst case of child.previous variable
+    def save(self, path) -> None:
+        """
+        Function description: Writes the graph to path as a CSRGraph snapshot (see CSRGraph.save), which holds the roads of
+        both layers and the passenger links. Raises ValueError if the graph has edges addTuple or can_link could not have made.
+        :Time complexity: O(|L| + |R|)
+        :Aux space complexity: O(|L| + |R|)
+        """
+        CSRGraph.from_graph(self).save(path)
 
-            
-        
-        while len(discovered) > 0: # O(V) because in worst case, all vertices are visited
-            served = discovered.serve() #O(logV) because of the sink operation which is O(log(V))
-            visited_vertices.append(str(served))
-            served.visited = True
-            if served.is_destination:
-                true_return = [] #Space goes up to O(V), same as return_statement
-                count += 1
-                if (best > served.distance) and count > 1:
-                    best = served.distance
-                    best_vertex = served
-                elif count == 1:           
-                    best = served.distance
-                    best_vertex = served
-                #reset all the vertices discovered and visited because if ran twice, the discovered and visited does not reset
-                if count == 2 or self.link == False:
-                    return_statement = backtracking(best_vertex)
-                    return_statement.append(best_vertex.id)
-                    for vertex in self.vertices: #O(V)
-                        vertex.visited = False
-                        vertex.discovered = False
-                        vertex.distance = 0
-                        vertex.previous = -1
-                        vertex.is_destination = False
-                    for t in range(len(return_statement)): #O(V) worst case
-                        if return_statement[t] >= len(self.vertices)//2 + self.vertices[0].id:
-                            return_statement[t] -= len(self.vertices)//2
-                            
-                    for p in range(len(return_statement)): #O(V) worst case
-                        if p + 1 == len(return_statement):
-                            true_return.append(return_statement[p])
-                        elif not return_statement[p] == return_statement[p+1]:
-                            true_return.append(return_statement[p])
-                    print(best)
-                    return true_return
-
-            for edge in served.edges: # O(V) because at most a vertex will have V-1 neighbours
-                #In total will be O(VlogV) because the algorithm goes through an edge and may rise it
-                child = self.findVertex(edge.destination,0,len(self.vertices)-1)
-                
-                if child.discovered == False:
-                    child.discovered = True
-                    child.distance = served.distance + edge.weight
-                    child.previous = served.id #V-1 vertices can be visited (a line of vertices
-                                                                  #and last vertex is the destination) so O(V)
-                    discovered.add(child) #O(log(V))
-                    
-                elif child.visited == False:
-                    if child.distance > served.distance + edge.weight:
-                        child.distance = served.distance + edge.weight
-                        child.previous = served.id
-                        discovered.rise(child.pos) #O(log(V)) because will not have more than 2V and 
-                    
-    def addVertex(self, V): #O(V) complexity to check every vertices
-        addToList = True
-        for vertex in self.vertices:
-            if V == vertex.id:
-                addToList = False              
+    @classmethod
+    def load(cls, path):
+        """
+        Function description: Rebuilds a graph from a snapshot written by save or CSRGraph.save. The vertices and edges are
+        created straight from the buffers, so unlike addTuple no location is ever looked up. To skip creating them at all,
+        use CSRGraph.load which memory maps the snapshot.
+        :Time complexity: O(|L| + |R|)
+        :Aux space complexity: O(|L| + |R|)
+        """
+        return cls.from_csr(CSRGraph.load(path, mapped=False))
+
+    @classmethod
+    def from_csr(cls, snapshot):
+        """
+        Function description: Creates the vertices and edges of a CSRGraph in the order addTuple and can_link would have,
+        without looking any location up.
+        :Time complexity: O(|L| + |R|)
+        :Aux space complexity: O(|L| + |R|)
+        """
+        L = snapshot.layer
+        first = snapshot.min_element
+        graph = cls(None, 2 * L, [], first, None)
+        for u in range(L): #O(|L| + |R|)
+            solo = graph.vertices[u].edges
+            carpool = graph.vertices[u + L].edges
+            if snapshot.links[u]: #can_link adds the passenger link before any road
+                solo.append(Edge(u + first, u + L + first, 0, u + L))
+                graph.linked.add(u + first)
+            for k in range(snapshot.offsets[u], snapshot.offsets[u + 1]):
+                v = snapshot.targets[k]
+                solo.append(Edge(u + first, v + first, snapshot.solo_weights[k], v))
+                carpool.append(Edge(u + L + first, v + L + first, snapshot.carpool_weights[k], v + L))
+        graph.link = snapshot.link
+        graph.version += 1
+        return graph
+
+    def _reverse_arcs(self, index):
+        """
+        Function description: The (position of source, weight) of every edge arriving at the vertex at index. They are worked
+        out for every vertex in O(|L| + |R|) the first time they are needed after the edges change, then it is O(1).
+        """
+        if self.reverse is None or self.reverse[0] != self.version:
+            arriving = [[] for _ in self.vertices]
+            for i, vertex in enumerate(self.vertices):
+                for edge in vertex.edges:
+                    arriving[edge.index].append((i, edge.weight))
+            self.reverse = (self.version, arriving)
+        return self.reverse[1][index]
+
+    def _location(self, index):
+        if index >= self.layer:
+            index -= self.layer
+        return self.vertices[index].id
+
+    def _passengers(self):
+        return self.linked
+
+    def _set_link(self, index, linked):
+        """
+        Function description: Adds or removes the edge from the vertex at index to its alternate equivalent, keeping the edges
+        arriving at the alternate vertex up to date if they have been worked out. The version is left alone since nothing
+        but the passengers changed. Returns whether anything changed.
+        :Time complexity: O(degree of the vertex)
+        """
+        location = self._location(index)
+        if (location in self.linked) == linked:
+            return False
+        vertex = self.vertices[index]
+        alternate = index + self.layer
+        arriving = self.reverse[1][alternate] if self.reverse is not None and self.reverse[0] == self.version else None
+        if linked:
+            vertex.edges.insert(0, Edge(vertex.id, self.vertices[alternate].id, 0, alternate)) #Where can_link puts it
+            self.linked.add(location)
+            if arriving is not None:
+                arriving.append((index, 0))
+        else: #The only edge from the original layer into the alternate layer
+            vertex.edges = [edge for edge in vertex.edges if edge.index != alternate]
+            self.linked.discard(location)
+            if arriving is not None:
+                arriving.remove((index, 0))
+        self.link = len(self.linked) > 0
+        return True
+
+    def _set_weights(self, start, end, w1, w2):
+        """
+        Function description: Sets the weight of every edge from the vertex at start to the vertex at end to w1, and of their
+        alternate equivalents to w2, keeping the edges arriving at end up to date if they have been worked out. The version
+        is left alone so the reverse edges and the contexts stay valid. Raises ValueError if there is no such edge.
+        :Time complexity: O(degree of the vertex at start)
+        """
+        L = self.layer
+        arriving = self.reverse[1] if self.reverse is not None and self.reverse[0] == self.version else None
+        found = False
+        for source, target, weight in ((start, end, w1), (start + L, end + L, w2)):
+            for edge in self.vertices[source].edges:
+                if edge.index == target:
+                    edge.weight = weight
+                    found = True
+            if arriving is not None:
+                arriving[target] = [(i, weight if i == source else w) for i, w in arriving[target]]
+        if not found:
+            raise ValueError("There is no road from " + str(self._location(start)) + " to " + str(self._location(end)) + ".")
+
+    @property
+    def layer(self) -> int:
+        return len(self.vertices)//2
+
+    def __len__(self) -> int:
+        return len(self.vertices)
+
+    def addVertex(self, V): #O(1) complexity to check the index
+        addToList = self.indexOf(V) is None
         if addToList == True:
+            if self.index is None and V != self.min_element + len(self.vertices):
+                self.index = {vertex.id: i for i, vertex in enumerate(self.vertices)} #O(V) once, ids stop being contiguous
+            if self.index is not None:
+                self.index[V] = len(self.vertices)
             self.vertices.append(Vertex(V))
+            self.version += 1
         else:
             print("no")
                           
@@ -399,26 +1502,575 @@ class Graph:
     
 class Vertex:
     def __init__(self, id) -> None:
-        self.pos = 1 
         self.id = id
-        self.edges = []
-        self.visited = False
-        self.discovered = False
-        self.distance = math.inf
-        self.previous = None
-        self.is_destination = False
+        self.edges = [] #The state of a query is kept in a Label of its SearchContext instead
      
     def __str__(self) -> str:
         return_string = str(self.id)
         return return_string
     
 class Edge:
-    def __init__(self,source,destination,weight) -> None:
+    def __init__(self,source,destination,weight,index=None) -> None:
         self.source = source
         self.destination = destination
         self.weight = weight
+        self.index = index #Position of the destination in Graph.vertices
  
     def __str__(self) -> str:
         return_string = ""
         return_string = " " + str(self.destination) + "/" + str(self.weight) + " | "
-        return return_string
\ No newline at end of file
+        return return_string
+
+
+class CSRGraph(LayeredGraph):
+    SNAPSHOT_MAGIC = b"CARPOOL\0"
+    SNAPSHOT_VERSION = 1
+    #magic, version, byte order, typecode of the weights, min_element, layer, amount of roads, then the buffers of _buffers
+    SNAPSHOT_HEADER = struct.Struct("<8sIccxxqqq")
+
+    def __init__(self, min_element, offsets, targets, solo_weights, carpool_weights, links) -> None:
+        """
+        Function description: Compressed sparse row (CSR) form of the two layer carpool graph. Instead of one Vertex
+                              object per layered location holding a list of Edge objects, the roads are kept once in flat
+                              buffers and the carpool layer is implied by them:
+                              - offsets[u]..offsets[u+1] is the slice of roads leaving location u
+                              - targets holds the destination of every road (as an index from min_element)
+                              - solo_weights and carpool_weights hold w1 and w2 of every road
+                              - links[u] is 1 if location u has a passenger, linking it to its alternate equivalent
+                              Location u in the graph is index u in the original layer and index u + |L| in the alternate layer,
+                              exactly like Graph with V = 2 * |L|.
+        :Aux space complexity: O(|L| + |R|) and no per location or per road Python objects
+        """
+        super().__init__()
+        self.min_element = min_element
+        self.offsets = offsets
+        self.targets = targets
+        self.solo_weights = solo_weights
+        self.carpool_weights = carpool_weights
+        self.links = links
+        self.layer = len(offsets) - 1
+        self.passenger_count = bytes(links).count(1)
+        self.link = self.passenger_count > 0
+        self.reverse = None #(offsets, sources, slots) of the roads arriving at every location, built when first needed
+        self.backing = None #What holds the buffers when they are views into memory the graph does not own
+
+    @classmethod
+    def from_tuples(cls, roads, start, V, passengers, min_element, end):
+        """
+        Function description: Builds the graph in bulk from (u,v,w1,w2) tuples. The arguments mean the same as in
+                              Graph(start, V, passengers, min_element, end) followed by addTuple(road, V//2) for every road,
+                              so V is the amount of layered locations. See from_roads.
+        :Time complexity: O(|L| + |R| + |P|)
+        :Aux space complexity: O(|L| + |R|)
+        """
+        return cls.from_roads(roads, start, V, passengers, min_element, end)
+
+    @classmethod
+    def from_roads(cls, roads, start, V, passengers, min_element, end, chunk_size=65536, typecode='q'):
+        """
+        Function description: Builds the graph in one pass over roads, which is either an iterable of (u,v,w1,w2) tuples or
+                              the path of a road file (see read_roads, typecode is the weight type of a binary one).
+                              The roads are taken chunk_size at a time into compact arrays, so no Python object is kept per
+                              road. The ids of a chunk are checked with min() and max() over the whole chunk and the roads
+                              leaving each location are counted with a Counter, both of which run in C.
+                              The original layer, the alternate layer and the passenger links all come from the same
+                              buffers (see CSRGraph), so nothing else has to be built for them.
+                              If the roads arrive ordered by source, as a road file usually is, they are already in CSR
+                              order and are used as they are. Otherwise they are bucketed by source with a counting sort
+                              that keeps the order they were given in, like addTuple.
+                              To get a Graph of Vertex and Edge objects instead, use Graph.from_csr on the result.
+        :Time complexity: O(|L| + |R| + |P|)
+        :Aux space complexity: O(|L| + |R|) and O(chunk_size) for the chunk being read
+        """
+        L = V//2
+        if isinstance(roads, (str, os.PathLike)):
+            chunks = read_roads(roads, chunk_size, typecode)
+        else:
+            chunks = _tuple_chunks(roads, chunk_size)
+
+        sources = array('q')
+        targets = array('q')
+        solo = array('q')
+        carpool = array('q')
+        counts = Counter()
+        ordered = True #Whether every road so far came after the roads of smaller sources
+        for us, vs, w1s, w2s in chunks: #O(|R|)
+            if len(us) == 0:
+                continue
+            if min(min(us), min(vs)) < min_element or max(max(us), max(vs)) >= min_element + L:
+                for road in zip(us, vs, w1s, w2s):
+                    if not (min_element <= road[0] < min_element + L and min_element <= road[1] < min_element + L):
+                        raise ValueError("Road " + str(road) + " is not between locations in the graph.")
+            if min_element != 0:
+                us = array('q', map((-min_element).__add__, us))
+                vs = array('q', map((-min_element).__add__, vs))
+            if 'd' in (w1s.typecode, w2s.typecode, solo.typecode):
+                if solo.typecode == 'q':
+                    solo = array('d', solo)
+                    carpool = array('d', carpool)
+                w1s = array('d', w1s) if w1s.typecode == 'q' else w1s
+                w2s = array('d', w2s) if w2s.typecode == 'q' else w2s
+            if ordered:
+                ordered = (len(sources) == 0 or sources[-1] <= us[0]) and us == array('q', sorted(us))
+            counts.update(us)
+            sources.extend(us)
+            targets.extend(vs)
+            solo.extend(w1s)
+            carpool.extend(w2s)
+
+        offsets = array('q', [0])
+        offsets.extend(accumulate(map(counts.get, range(L), repeat(0)))) #offsets[u] is where the roads of u begin
+        if not ordered:
+            fill = offsets[:-1] #Next free slot of every location
+            sorted_targets = array('q', bytes(8 * len(sources)))
+            solo_weights = array(solo.typecode, bytes(8 * len(sources)))
+            carpool_weights = array(solo.typecode, bytes(8 * len(sources)))
+            for k in range(len(sources)): #O(|R|)
+                u = sources[k]
+                slot = fill[u]
+                fill[u] += 1
+                sorted_targets[slot] = targets[k]
+                solo_weights[slot] = solo[k]
+                carpool_weights[slot] = carpool[k]
+            targets, solo, carpool = sorted_targets, solo_weights, carpool_weights
+
+        links = bytearray(L)
+        for vertex in passengers: #O(|P|) same rule as Graph.can_link
+            if (vertex != start or vertex != end) and min_element <= vertex < L:
+                links[vertex - min_element] = 1
+        return cls(min_element, offsets, targets, solo, carpool, links)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Function description: Converts a Graph built with addTuple and can_link. The road edges of location u are paired in
+        order with the edges of its alternate equivalent, because addTuple appends one to each. Raises ValueError if the graph
+        has an edge that addTuple or can_link could not have made.
+        :Time complexity: O(|L| + |R|)
+        :Aux space complexity: O(|L| + |R|)
+        """
+        L = graph.layer
+        if graph.index is not None or len(graph.vertices) != 2 * L:
+            raise ValueError("Only a graph with contiguous locations in two layers can be converted.")
+        roads = []
+        linked = []
+        for u in range(L): #O(|L| + |R|)
+            solo = []
+            for edge in graph.vertices[u].edges:
+                if edge.index == u + L and edge.weight == 0:
+                    linked.append(u)
+                elif edge.index < L:
+                    solo.append(edge)
+                else:
+                    raise ValueError("Edge " + str(edge) + "of location " + str(u + graph.min_element) + " leaves the original layer.")
+            carpool = graph.vertices[u + L].edges
+            if len(solo) != len(carpool) or any(edge.index != L + road.index for road, edge in zip(solo, carpool)):
+                raise ValueError("The roads of location " + str(u + graph.min_element) + " differ between the layers.")
+            for road, edge in zip(solo, carpool):
+                roads.append((road.source, road.destination, road.weight, edge.weight))
+        converted = cls.from_tuples(roads, None, 2 * L, [], graph.min_element, None)
+        for u in linked: #Set from the link edges as they are, add_passengers can link ids that can_link would have refused
+            converted._set_link(u, True)
+        return converted
+
+    def _buffers(self):
+        """
+        Function description: The buffers of the graph in the order they are laid out in one block of memory by SharedGraph.
+        """
+        return (self.offsets, self.targets, self.solo_weights, self.carpool_weights, self.links)
+
+    @classmethod
+    def _from_buffer(cls, buffer, min_element, layer, roads, typecode, at=0):
+        """
+        Function description: Builds a graph whose buffers are views into buffer from position at, laid out like _buffers,
+        without copying them.
+        :Time complexity: O(|L|) to check for passengers
+        :Aux space complexity: O(1)
+        """
+        view = memoryview(buffer)
+        parts = []
+        for size, code in ((layer + 1, 'q'), (roads, 'q'), (roads, typecode), (roads, typecode), (layer, 'B')):
+            itemsize = 1 if code == 'B' else 8
+            parts.append(view[at:at + size * itemsize].cast(code))
+            at += size * itemsize
+        return cls(min_element, *parts)
+
+    def save(self, path) -> None:
+        """
+        Function description: Writes the graph to path as a snapshot: a header followed by the buffers exactly as they are in
+        memory, so that load only has to map them. Every buffer starts 8 byte aligned.
+        :Time complexity: O(|L| + |R|)
+        :Aux space complexity: O(1)
+        """
+        typecode = memoryview(self.solo_weights).format
+        header = self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, self.SNAPSHOT_VERSION, sys.byteorder[0].encode(),
+                                           typecode.encode(), self.min_element, self.layer, len(self.targets))
+        with open(path, "wb") as file:
+            file.write(header)
+            for buffer in self._buffers():
+                file.write(memoryview(buffer).cast('B'))
+
+    @classmethod
+    def load(cls, path, mapped=True):
+        """
+        Function description: Reads a snapshot written by save. If mapped, the file is memory mapped and the graph reads its
+        buffers straight from it, so loading costs O(|L|) to check for passengers however many roads there are and the
+        operating system pages the roads in as they are used. Call close() to unmap it. Otherwise the buffers are copied into
+        arrays, which is O(|L| + |R|) but with a single copy per buffer and no parsing.
+        Raises ValueError if path is not a snapshot this version can read.
+        """
+        with open(path, "rb") as file:
+            if mapped:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = file.read()
+        try:
+            min_element, layer, roads, typecode = cls._snapshot_header(path, data)
+        except ValueError:
+            if mapped: #Nothing will use the mapping
+                data.close()
+            raise
+
+        graph = cls._from_buffer(data, min_element, layer, roads, typecode, cls.SNAPSHOT_HEADER.size)
+        if mapped:
+            graph.backing = data
+            return graph
+        parts = []
+        for buffer in graph._buffers():
+            if buffer.format == 'B':
+                parts.append(bytearray(buffer))
+            else:
+                part = array(buffer.format)
+                part.frombytes(buffer.cast('B'))
+                parts.append(part)
+        return cls(min_element, *parts)
+
+    @classmethod
+    def _snapshot_header(cls, path, data):
+        """
+        Function description: Checks the header of the snapshot in data, read from path, and returns its min_element, layer,
+        amount of roads and typecode. Raises ValueError if it is not a snapshot this version can read.
+        """
+        if len(data) < cls.SNAPSHOT_HEADER.size:
+            raise ValueError(str(path) + " is not a carpool graph snapshot.")
+        magic, version, byteorder, typecode, min_element, layer, roads = cls.SNAPSHOT_HEADER.unpack_from(data)
+        if magic != cls.SNAPSHOT_MAGIC:
+            raise ValueError(str(path) + " is not a carpool graph snapshot.")
+        if version != cls.SNAPSHOT_VERSION:
+            raise ValueError(str(path) + " is snapshot version " + str(version) + ", only version " + str(cls.SNAPSHOT_VERSION) + " can be read.")
+        if byteorder != sys.byteorder[0].encode():
+            raise ValueError(str(path) + " was saved on a machine with a different byte order.")
+        if len(data) != cls.SNAPSHOT_HEADER.size + 8 * (layer + 1 + 3 * roads) + layer:
+            raise ValueError(str(path) + " is truncated.")
+        return min_element, layer, roads, typecode.decode()
+
+    def close(self) -> None:
+        """
+        Function description: Releases the buffers when they are views into memory the graph does not own (see backing) and
+        closes that memory. The graph cannot be used afterwards.
+        """
+        if self.backing is not None:
+            for buffer in self._buffers():
+                buffer.release()
+            self.backing.close()
+            self.backing = None
+
+    def __len__(self) -> int:
+        return 2 * self.layer
+
+    def indexOf(self, key):
+        """
+        Function description: Returns the search index of the layered location key, like Graph.indexOf.
+        """
+        index = key - self.min_element
+        if 0 <= index < 2 * self.layer:
+            return index
+        return None
+
+    def _location(self, index):
+        if index >= self.layer:
+            index -= self.layer
+        return index + self.min_element
+
+    def _passengers(self):
+        links = bytes(self.links)
+        at = links.find(1)
+        while at != -1: #O(|L|) in C, O(|P|) in Python
+            yield at + self.min_element
+            at = links.find(1, at + 1)
+
+    def _set_link(self, index, linked):
+        """
+        Function description: Sets the passenger flag of location index, which _arcs and _reverse_arcs read on every call so
+        nothing else has to change. Raises ValueError if the graph is a read only memory mapped snapshot. O(1)
+        """
+        if bool(self.links[index]) == linked:
+            return False
+        if isinstance(self.links, memoryview) and self.links.readonly:
+            raise ValueError("The passengers of a memory mapped snapshot cannot change, load it with mapped=False.")
+        self.links[index] = 1 if linked else 0
+        self.passenger_count += 1 if linked else -1
+        self.link = self.passenger_count > 0
+        return True
+
+    def _set_weights(self, start, end, w1, w2):
+        """
+        Function description: Sets w1 and w2 of every road from location start to location end in the weight buffers, which
+        _arcs and _reverse_arcs read on every call. Raises ValueError if there is no such road, if the graph is a read only
+        memory mapped snapshot or if the weights are not integers while the buffers hold integers.
+        :Time complexity: O(degree of start)
+        """
+        if isinstance(self.solo_weights, memoryview) and self.solo_weights.readonly:
+            raise ValueError("The weights of a memory mapped snapshot cannot change, load it with mapped=False.")
+        if memoryview(self.solo_weights).format == 'q' and not (isinstance(w1, int) and isinstance(w2, int)):
+            raise ValueError("The weights of this graph are integers, build it with float weights to use " + str((w1, w2)) + ".")
+        found = False
+        for k in range(self.offsets[start], self.offsets[start + 1]):
+            if self.targets[k] == end:
+                self.solo_weights[k] = w1
+                self.carpool_weights[k] = w2
+                found = True
+        if not found:
+            raise ValueError("There is no road from " + str(self._location(start)) + " to " + str(self._location(end)) + ".")
+
+    def _arcs(self, index):
+        """
+        Function description: The (index of destination, weight) of the edges leaving the search index, used by SearchContext.
+        An index s is location s in the original layer if s < |L| and location s - |L| in the alternate layer otherwise.
+        The passenger link comes first, like the edge can_link adds before any road in Graph.
+        """
+        L = self.layer
+        if index < L:
+            begin = self.offsets[index]
+            end = self.offsets[index + 1]
+            arcs = list(zip(self.targets[begin:end], self.solo_weights[begin:end]))
+            if self.links[index]:
+                arcs.insert(0, (index + L, 0))
+            return arcs
+        begin = self.offsets[index - L]
+        end = self.offsets[index - L + 1]
+        return [(target + L, weight) for target, weight in zip(self.targets[begin:end], self.carpool_weights[begin:end])]
+
+    def _reverse_arcs(self, index):
+        """
+        Function description: The (index of source, weight) of the edges arriving at the search index. The roads arriving at
+        every location are bucketed by destination with a counting sort the first time they are needed, keeping the slot of
+        each road in the forward buffers so its weights are read from there.
+        """
+        if self.reverse is None:
+            L = self.layer
+            offsets = array('q', bytes(8 * (L + 1)))
+            for v in self.targets: #O(|R|)
+                offsets[v + 1] += 1
+            for v in range(L): #O(|L|)
+                offsets[v + 1] += offsets[v]
+            fill = offsets[:-1]
+            sources = array('q', bytes(8 * len(self.targets)))
+            slots = array('q', bytes(8 * len(self.targets)))
+            for u in range(L): #O(|L| + |R|)
+                for k in range(self.offsets[u], self.offsets[u + 1]):
+                    v = self.targets[k]
+                    sources[fill[v]] = u
+                    slots[fill[v]] = k
+                    fill[v] += 1
+            self.reverse = (offsets, sources, slots)
+        offsets, sources, slots = self.reverse
+        L = self.layer
+        if index < L:
+            return [(sources[k], self.solo_weights[slots[k]]) for k in range(offsets[index], offsets[index + 1])]
+        base = index - L
+        arcs = [(sources[k] + L, self.carpool_weights[slots[k]]) for k in range(offsets[base], offsets[base + 1])]
+        if self.links[base]:
+            arcs.insert(0, (base, 0))
+        return arcs
+
+
+
+def _tuple_chunks(roads, chunk_size):
+    """
+    Function description: Yields the (u,v,w1,w2) tuples of roads as (sources, destinations, w1s, w2s) arrays of up to chunk_size
+    roads. Weights are int64 unless a chunk has a float weight.
+    """
+    roads = iter(roads)
+    while True:
+        chunk = list(islice(roads, chunk_size))
+        if len(chunk) == 0:
+            return
+        us, vs, w1s, w2s = zip(*chunk)
+        weights = []
+        for column in (w1s, w2s):
+            try:
+                weights.append(array('q', column))
+            except TypeError:
+                weights.append(array('d', column))
+        yield array('q', us), array('q', vs), weights[0], weights[1]
+
+
+def read_roads(path, chunk_size=65536, typecode='q'):
+    """
+    Function description: Yields the roads of a road file as (sources, destinations, w1s, w2s) arrays of up to chunk_size roads.
+    A path ending in .csv is read as u,v,w1,w2 lines, with an optional header line. Any other path is a binary road file of
+    32 bytes per road: u and v as int64 then w1 and w2 as typecode ('q' for int64 or 'd' for float64), in native byte order,
+    as written by write_roads. A binary chunk is split into columns with strided memoryviews, without touching single roads.
+    """
+    if str(path).endswith(".csv"):
+        with open(path, newline="") as file:
+            reader = csv.reader(file)
+            first = True
+            while True:
+                rows = [row for row in islice(reader, chunk_size) if len(row) > 0]
+                if first and len(rows) > 0 and not rows[0][0].strip().lstrip("-").isdigit():
+                    rows.pop(0) #Header
+                first = False
+                if len(rows) == 0:
+                    return
+                columns = []
+                for column in zip(*rows):
+                    try:
+                        columns.append(array('q', map(int, column)))
+                    except ValueError:
+                        columns.append(array('d', map(float, column)))
+                yield tuple(columns)
+    else:
+        with open(path, "rb") as file:
+            while True:
+                data = file.read(32 * chunk_size)
+                if len(data) == 0:
+                    return
+                if len(data) % 32 != 0:
+                    raise ValueError(str(path) + " is not a whole amount of roads.")
+                ids = memoryview(data).cast('q')
+                weights = memoryview(data).cast(typecode)
+                yield (array('q', ids[0::4].tobytes()), array('q', ids[1::4].tobytes()),
+                       array(typecode, weights[2::4].tobytes()), array(typecode, weights[3::4].tobytes()))
+
+
+def write_roads(path, roads, typecode='q', chunk_size=65536):
+    """
+    Function description: Writes an iterable of (u,v,w1,w2) tuples as a binary road file that read_roads can read.
+    """
+    with open(path, "wb") as file:
+        for us, vs, w1s, w2s in _tuple_chunks(roads, chunk_size):
+            data = bytearray(32 * len(us))
+            ids = memoryview(data).cast('q')
+            weights = memoryview(data).cast(typecode)
+            ids[0::4] = us
+            ids[1::4] = vs
+            weights[2::4] = array(typecode, w1s)
+            weights[3::4] = array(typecode, w2s)
+            file.write(data)
+            ids.release()
+            weights.release()
+
+
+class SharedGraph:
+    def __init__(self, graph) -> None:
+        """
+        Function description: Copies a CSRGraph once into a block of shared memory so that other processes can attach to it
+        with the handle instead of pickling and rebuilding the graph. Call close() when no process needs it anymore.
+        :Time complexity: O(|L| + |R|)
+        :Aux space complexity: O(|L| + |R|) of shared memory
+        """
+        buffers = [memoryview(buffer).cast('B') for buffer in graph._buffers()]
+        self.memory = shared_memory.SharedMemory(create=True, size=max(1, sum(len(buffer) for buffer in buffers)))
+        at = 0
+        for buffer in buffers:
+            self.memory.buf[at:at + len(buffer)] = buffer
+            at += len(buffer)
+        typecode = memoryview(graph.solo_weights).format
+        self.handle = (self.memory.name, graph.min_element, graph.layer, len(graph.targets), typecode)
+
+    @staticmethod
+    def attach(handle) -> CSRGraph:
+        """
+        Function description: Returns a CSRGraph reading straight from the shared memory of handle. O(|L|) time, O(1) aux space.
+        """
+        name, min_element, layer, roads, typecode = handle
+        memory = shared_memory.SharedMemory(name=name)
+        graph = CSRGraph._from_buffer(memory.buf, min_element, layer, roads, typecode)
+        graph.backing = memory
+        return graph
+
+    def close(self) -> None:
+        self.memory.close()
+        self.memory.unlink()
+
+
+_worker_graph = None #The graph a ParallelRouter worker process has attached to
+
+
+def _attach_worker(handle):
+    global _worker_graph
+    _worker_graph = SharedGraph.attach(handle)
+
+
+def _route_chunk(queries):
+    return _worker_graph.route_many(queries)
+
+
+def _matrix_chunk(sources, targets):
+    return _worker_graph.cost_matrix(sources, targets)
+
+
+class ParallelRouter:
+    def __init__(self, graph, workers=None) -> None:
+        """
+        Function description: Answers routing queries on a pool of worker processes. graph (a Graph or a CSRGraph) is put in
+        shared memory once and every worker attaches to it, so no worker pickles or rebuilds Vertex and Edge objects.
+        workers defaults to the amount of CPUs. Use it in a with statement or call close() to stop the workers.
+        """
+        if not isinstance(graph, CSRGraph):
+            graph = CSRGraph.from_graph(graph)
+        self.shared = SharedGraph(graph)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.pool = multiprocessing.Pool(self.workers, initializer=_attach_worker, initargs=(self.shared.handle,))
+
+    def route_many(self, queries):
+        """
+        Function description: Same as LayeredGraph.route_many, with the queries split by source into chunks for the workers
+        so that the queries sharing a source are still answered by one search.
+        :Time complexity: O(|S||R|log(|L|) / workers) where |S| is the amount of different sources
+        :Aux space complexity: O(|Q| + |Q||R|) for the queries and their routes
+        """
+        queries = list(queries)
+        groups = {}
+        for position, query in enumerate(queries): #O(|Q|)
+            groups.setdefault(query[0], []).append(position)
+
+        chunks = [[] for _ in range(4 * self.workers)] #A few chunks per worker so a slow chunk does not hold the others up
+        for i, positions in enumerate(groups.values()):
+            chunks[i % len(chunks)].extend(positions)
+        chunks = [chunk for chunk in chunks if len(chunk) > 0]
+
+        results = [None] * len(queries)
+        answers = self.pool.map(_route_chunk, [[queries[position] for position in chunk] for chunk in chunks])
+        for chunk, routes in zip(chunks, answers):
+            for position, route in zip(chunk, routes):
+                results[position] = route
+        return results
+
+    def cost_matrix(self, sources, targets):
+        """
+        Function description: Same as LayeredGraph.cost_matrix, with the sources split into chunks for the workers.
+        :Time complexity: O(|S||R|log(|L|) / workers)
+        :Aux space complexity: O(|S||T|) for the matrix
+        """
+        sources = list(sources)
+        targets = list(targets)
+        size = max(1, -(-len(sources) // (4 * self.workers))) #A few chunks per worker so a slow chunk does not hold the others up
+        chunks = [(sources[at:at + size], targets) for at in range(0, len(sources), size)]
+        matrix = []
+        for rows in self.pool.starmap(_matrix_chunk, chunks):
+            matrix.extend(rows)
+        return matrix
+
+    def close(self) -> None:
+        self.pool.close()
+        self.pool.join()
+        self.shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
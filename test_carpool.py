@@ -0,0 +1,442 @@
+"""
+Tests for the carpool graph, run with:
+    python -m pytest test_carpool.py
+"""
+import math
+import mmap
+import random
+import sys
+import types
+
+import pytest
+
+import carpool
+
+from carpool import Graph, CSRGraph, ParallelRouter, QUEUES, read_roads, write_roads
+
+
+def random_network(locations, roads, seed):
+    """
+    Function description: Seeded (u,v,w1,w2) roads between random locations, with w2 never worse than w1, and a few passengers.
+    """
+    rng = random.Random(seed)
+    network = []
+    for _ in range(roads):
+        w1 = rng.randint(1, 20)
+        network.append((rng.randrange(locations), rng.randrange(locations), w1, rng.randint(1, w1)))
+    return network, rng.sample(range(locations), rng.randint(0, min(3, locations)))
+
+
+def build_graph(roads, locations, passengers):
+    graph = Graph(None, 2 * locations, passengers, 0, None)
+    for road in roads:
+        graph.addTuple(road, locations)
+    return graph
+
+
+def both_graphs(roads, locations, passengers):
+    return [build_graph(roads, locations, passengers), CSRGraph.from_tuples(roads, None, 2 * locations, passengers, 0, None)]
+
+
+def costs(graph, queries):
+    return [route.cost for route in graph.route_many(queries)]
+
+
+def costs_on(graph, queries, context):
+    return [route.cost for route in graph.route_many(queries, context)]
+
+
+def fresh_costs(roads, locations, passengers, queries):
+    return costs(CSRGraph.from_tuples(roads, None, 2 * locations, sorted(passengers), 0, None), queries)
+
+
+@pytest.mark.parametrize("kind", [Graph, CSRGraph])
+def test_long_route_keeps_every_hop(kind):
+    hops = 50000
+    roads = [(u, u + 1, 2, 1) for u in range(hops - 1)]
+    passengers = [hops // 2]
+    if kind is Graph:
+        graph = build_graph(roads, hops, passengers)
+    else:
+        graph = CSRGraph.from_tuples(roads, None, 2 * hops, passengers, 0, None)
+    route = graph.route(0, hops - 1)
+    assert route.path == list(range(hops))
+    assert route.cost == 2 * (hops // 2) + (hops - 1 - hops // 2) #Carpool lane after the passenger
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_cache_gives_the_same_routes(seed):
+    rng = random.Random(seed)
+    locations = rng.randint(2, 25)
+    roads, passengers = random_network(locations, rng.randint(0, 70), seed)
+    queries = [(rng.randrange(locations), rng.randrange(locations)) for _ in range(15)]
+    for graph in both_graphs(roads, locations, passengers):
+        plain = graph.route_many(queries)
+        graph.enable_cache(3)
+        for _ in range(2):
+            cached = graph.route_many(queries)
+            assert [route.cost for route in cached] == [route.cost for route in plain]
+            for before, after in zip(plain, cached):
+                assert (before.path is None) == (after.path is None)
+                if after.path is not None:
+                    assert (after.path[0], after.path[-1]) == (after.source, after.destination)
+
+
+def test_cache_counts_hits_and_drops_trees_when_roads_change():
+    graph = build_graph([(0, 1, 5, 5), (1, 2, 5, 1)], 3, [1])
+    cache = graph.enable_cache(2)
+    assert graph.route(0, 2).cost == 6
+    assert graph.route(0, 1).cost == 5
+    assert (cache.info().hits, cache.info().misses) == (1, 1)
+    graph.addTuple((0, 2, 1, 1), 3)
+    assert graph.route(0, 2).cost == 1
+    assert cache.info().invalidations == 1
+    graph.route(1, 2)
+    graph.route(2, 0)
+    assert cache.info().evictions == 1
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_dijkstra_refuses_sources_outside_the_original_layer(cached, capsys):
+    for graph in both_graphs([(0, 1, 3, 1)], 2, [0]):
+        if cached:
+            graph.enable_cache(2)
+        assert graph.dijkstra(0, 1) == [0, 1]
+        assert capsys.readouterr().out == "1\n"
+        with pytest.raises(ValueError):
+            graph.dijkstra(2, 3) #Carpool copies of 0 and 1
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_cost_matrix_matches_route_many(seed):
+    rng = random.Random(seed)
+    locations = rng.randint(2, 25)
+    roads, passengers = random_network(locations, rng.randint(0, 70), seed)
+    sources = rng.sample(range(locations), rng.randint(1, locations))
+    targets = [rng.randrange(locations) for _ in range(rng.randint(0, locations))]
+    for graph in both_graphs(roads, locations, passengers):
+        expected = [costs(graph, [(source, target) for target in targets]) for source in sources]
+        assert graph.cost_matrix(sources, targets) == expected
+        graph.enable_cache()
+        assert graph.cost_matrix(sources, targets) == expected #From the cached trees
+
+
+@pytest.mark.parametrize("queue", sorted(QUEUES))
+@pytest.mark.parametrize("seed", range(30))
+def test_passenger_changes_match_a_rebuild(seed, queue):
+    rng = random.Random(seed)
+    locations = rng.randint(2, 25)
+    roads, passengers = random_network(locations, rng.randint(0, 70), seed)
+    queries = [(rng.randrange(locations), rng.randrange(locations)) for _ in range(10)]
+    graphs = both_graphs(roads, locations, passengers)
+    for graph in graphs:
+        graph.enable_cache(4)
+    current = set(passengers)
+    for _ in range(6):
+        removed = rng.sample(range(locations), rng.randint(0, 2))
+        added = rng.sample(range(locations), rng.randint(0, 2))
+        for graph in graphs:
+            graph.remove_passengers(removed)
+            graph.add_passengers(added)
+        current = (current - set(removed)) | set(added)
+        expected = fresh_costs(roads, locations, current, queries)
+        for graph in graphs:
+            assert graph.passengers() == frozenset(current)
+            assert graph.link == (len(current) > 0)
+            for mode in ("dijkstra", "bidirectional", "alt"):
+                assert [graph.route(source, destination, mode).cost for source, destination in queries] == expected
+            assert costs_on(graph, queries, graph.queue_context(queue)) == expected
+            for (source, destination), cost in zip(queries, expected):
+                assert (graph.dijkstra(source, destination, queue=queue) is None) == (cost == math.inf)
+
+
+def test_trees_of_other_passengers_are_kept():
+    graph = CSRGraph.from_tuples([(0, 1, 5, 5), (1, 2, 5, 1)], None, 6, [1], 0, None)
+    cache = graph.enable_cache()
+    assert graph.route(0, 2).cost == 6
+    graph.remove_passengers([1])
+    assert graph.route(0, 2).cost == 10
+    graph.add_passengers([1])
+    assert graph.route(0, 2).cost == 6
+    assert cache.info().hits == 1
+
+
+def test_passengers_must_be_locations():
+    graph = build_graph([(0, 1, 1, 1)], 2, [])
+    with pytest.raises(ValueError):
+        graph.add_passengers([5])
+
+
+@pytest.mark.parametrize("kind", [Graph, CSRGraph])
+def test_parallel_router_matches_in_process(kind):
+    roads, passengers = random_network(40, 150, 5)
+    graph = both_graphs(roads, 40, passengers)[kind is CSRGraph]
+    rng = random.Random(5)
+    queries = [(rng.randrange(40), rng.randrange(40)) for _ in range(60)]
+    sources = rng.sample(range(40), 12)
+    expected = graph.route_many(queries)
+    with ParallelRouter(graph, 2) as router:
+        routes = router.route_many(queries)
+        matrix = router.cost_matrix(sources, range(40))
+    assert [route.cost for route in routes] == [route.cost for route in expected]
+    assert [route.path is None for route in routes] == [route.path is None for route in expected]
+    assert matrix == graph.cost_matrix(sources, range(40))
+
+
+def test_links_outside_can_link_survive_snapshots(tmp_path):
+    graph = Graph(None, 10, [], 5, None)
+    for road in [(5, 6, 4, 1), (6, 9, 4, 1), (5, 9, 10, 10)]:
+        graph.addTuple(road, 5)
+    graph.add_passengers([6]) #can_link only links ids below the amount of locations
+    assert graph.route(5, 9).cost == 5
+    graph.save(tmp_path / "graph.bin")
+    assert Graph.load(tmp_path / "graph.bin").route(5, 9).cost == 5
+    assert CSRGraph.load(tmp_path / "graph.bin").route(5, 9).cost == 5
+    assert CSRGraph.from_graph(graph).route(5, 9).cost == 5
+
+
+def test_vertices_added_out_of_order_are_found_but_not_saved(tmp_path):
+    graph = Graph(None, 4, [], 10, None)
+    graph.addVertex(20) #Ids stop being contiguous here
+    graph.addVertex(14)
+    assert [graph.indexOf(id) for id in (10, 13, 20, 14, 15, 9)] == [0, 3, 4, 5, None, None]
+    assert graph.findVertex(20).id == 20
+    assert graph.findVertex(11, 1, 3).id == 11
+    assert graph.findVertex(20, high=3) == "Not found"
+    assert graph.findVertex(15) == "Not found"
+    with pytest.raises(ValueError):
+        CSRGraph.from_graph(graph)
+    with pytest.raises(ValueError):
+        graph.save(tmp_path / "graph.bin")
+    assert not (tmp_path / "graph.bin").exists()
+
+
+@pytest.mark.parametrize("dynamic", [False, True])
+@pytest.mark.parametrize("seed", range(30))
+def test_weight_changes_match_a_rebuild(seed, dynamic):
+    rng = random.Random(seed)
+    locations = rng.randint(2, 25)
+    roads, passengers = random_network(locations, rng.randint(1, 70), seed)
+    roads = [list(road) for road in roads]
+    queries = [(rng.randrange(locations), rng.randrange(locations)) for _ in range(12)]
+    graphs = both_graphs(roads, locations, passengers)
+    for graph in graphs:
+        graph.enable_cache(8, dynamic)
+    for _ in range(6):
+        for graph in graphs:
+            costs(graph, queries)
+        changes = []
+        for _ in range(rng.randint(1, 4)): #The same road can change twice, the last weights win
+            road = rng.choice(roads)
+            w1 = rng.randint(0, 30)
+            changes.append((road[0], road[1], w1, rng.randint(0, w1)))
+        for road in roads:
+            for u, v, w1, w2 in changes:
+                if (road[0], road[1]) == (u, v):
+                    road[2], road[3] = w1, w2
+        for graph in graphs:
+            graph.update_weights(changes)
+        expected = fresh_costs([tuple(road) for road in roads], locations, passengers, queries)
+        for graph in graphs:
+            for mode in ("dijkstra", "bidirectional", "alt"):
+                assert [graph.route(source, destination, mode).cost for source, destination in queries] == expected
+
+
+def test_dynamic_cache_does_not_repair_trees_of_other_passengers():
+    graph = CSRGraph.from_tuples([(0, 1, 5, 5), (1, 2, 5, 1)], None, 6, [1], 0, None)
+    graph.enable_cache(dynamic=True)
+    assert graph.route(0, 2).cost == 6
+    graph.remove_passengers([1])
+    assert graph.route(0, 2).cost == 10
+    graph.update_weight(0, 1, 7, 7)
+    graph.add_passengers([1])
+    assert graph.route(0, 2).cost == 8
+
+
+def test_dynamic_cache_drops_trees_of_an_older_version():
+    graph = build_graph([(0, 1, 5, 5), (1, 2, 5, 1)], 3, [1])
+    cache = graph.enable_cache(dynamic=True)
+    assert graph.route(0, 2).cost == 6
+    graph.addTuple((0, 2, 9, 9), 3)
+    graph.update_weight(1, 2, 5, 5)
+    assert (len(cache), cache.info().invalidations) == (0, 1)
+    assert graph.route(0, 2).cost == 9
+
+
+@pytest.mark.parametrize("dynamic", [False, True])
+@pytest.mark.parametrize("seed", range(100))
+def test_passenger_and_weight_changes_match_a_rebuild(seed, dynamic):
+    rng = random.Random(seed)
+    locations = rng.randint(2, 20)
+    roads, passengers = random_network(locations, rng.randint(1, 60), seed)
+    roads = [list(road) for road in roads]
+    queries = [(rng.randrange(locations), rng.randrange(locations)) for _ in range(10)]
+    graphs = both_graphs(roads, locations, passengers)
+    for graph in graphs:
+        graph.enable_cache(8, dynamic)
+    current = set(passengers)
+    for _ in range(8):
+        for graph in graphs:
+            costs(graph, queries)
+        if rng.random() < 0.5:
+            removed = rng.sample(range(locations), rng.randint(0, 2))
+            added = rng.sample(range(locations), rng.randint(0, 2))
+            for graph in graphs:
+                graph.remove_passengers(removed)
+                graph.add_passengers(added)
+            current = (current - set(removed)) | set(added)
+        else:
+            u, v, _, _ = rng.choice(roads)
+            w1 = rng.randint(0, 30)
+            w2 = rng.randint(0, w1)
+            for road in roads: #update_weight changes every road from u to v
+                if (road[0], road[1]) == (u, v):
+                    road[2], road[3] = w1, w2
+            for graph in graphs:
+                graph.update_weight(u, v, w1, w2)
+        expected = fresh_costs([tuple(road) for road in roads], locations, current, queries)
+        for graph in graphs:
+            assert costs(graph, queries) == expected
+
+
+def test_profiler_counts_agree_and_can_not_nest():
+    roads, passengers = random_network(200, 800, 1)
+    graph = build_graph(roads, 200, passengers)
+    with graph.profile() as profiler:
+        graph.route(0, 150, "alt") #Prepares the landmarks first
+        graph.route(0, 150)
+        with pytest.raises(ValueError):
+            with graph.profile():
+                pass
+        graph.route(1, 150)
+    assert [stats.query for stats in profiler.stats] == ["route"] * 3
+    degree = max(max(len(graph._arcs(index)), len(graph._reverse_arcs(index))) for index in range(len(graph)))
+    for stats in profiler.stats: #Every settled location relaxes its edges once
+        assert 0 < stats.settled <= stats.pushes
+        assert stats.relaxed <= degree * stats.settled
+    assert "_arcs" not in vars(graph) and "begin" not in vars(graph.context)
+    with graph.profile() as again:
+        graph.route(0, 150)
+    assert len(again.stats) == 1
+
+
+def road_columns(chunks):
+    """
+    Function description: Joins the (sources, destinations, w1s, w2s) chunks of read_roads back into (u,v,w1,w2) tuples.
+    """
+    return [road for chunk in chunks for road in zip(*chunk)]
+
+
+def all_costs(graph, locations, first=0):
+    return graph.cost_matrix(range(first, first + locations), range(first, first + locations))
+
+
+@pytest.mark.parametrize("header", [False, True])
+def test_csv_roads_with_and_without_a_header(tmp_path, header):
+    roads, passengers = random_network(30, 90, 3)
+    path = tmp_path / "roads.csv"
+    with open(path, "w") as file:
+        if header:
+            file.write("u,v,w1,w2\n")
+        for road in roads:
+            file.write(",".join(map(str, road)) + "\n")
+    assert road_columns(read_roads(path, chunk_size=7)) == roads
+    graph = CSRGraph.from_roads(path, None, 60, passengers, 0, None, chunk_size=7)
+    assert all_costs(graph, 30) == all_costs(CSRGraph.from_tuples(roads, None, 60, passengers, 0, None), 30)
+
+
+@pytest.mark.parametrize("typecode", ["q", "d"])
+def test_binary_roads_round_trip(tmp_path, typecode):
+    roads, passengers = random_network(30, 90, 4)
+    if typecode == "d":
+        roads = [(u, v, w1 + 0.5, w2 + 0.25) for u, v, w1, w2 in roads]
+    path = tmp_path / "roads.bin"
+    write_roads(path, roads, typecode, chunk_size=8)
+    assert road_columns(read_roads(path, chunk_size=5, typecode=typecode)) == roads
+    graph = CSRGraph.from_roads(path, None, 60, passengers, 0, None, chunk_size=5, typecode=typecode)
+    assert all_costs(graph, 30) == all_costs(CSRGraph.from_tuples(roads, None, 60, passengers, 0, None), 30)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_shuffled_roads_across_chunks_match_ordered_roads(seed):
+    roads, passengers = random_network(25, 80, seed)
+    ordered = sorted(roads, key=lambda road: road[0])
+    shuffled = list(roads)
+    random.Random(seed).shuffle(shuffled)
+    expected = all_costs(build_graph(ordered, 25, passengers), 25)
+    for given in (ordered, shuffled):
+        graph = CSRGraph.from_roads(given, None, 50, passengers, 0, None, chunk_size=6)
+        assert list(graph.offsets) == list(CSRGraph.from_tuples(ordered, None, 50, passengers, 0, None).offsets)
+        assert all_costs(graph, 25) == expected
+
+
+def test_int_weights_become_float_partway():
+    roads = [(0, 1, 2, 1), (1, 2, 3, 2), (2, 3, 1.5, 0.5), (3, 4, 2, 2)] #'q' chunks, then a 'd' one, then 'q' again
+    graph = CSRGraph.from_roads(roads, None, 10, [0], 0, None, chunk_size=2)
+    assert memoryview(graph.solo_weights).format == "d"
+    assert graph.route(0, 4).cost == 1 + 2 + 0.5 + 2
+    assert graph.route(0, 2).cost == 3
+
+
+@pytest.mark.parametrize("road", [(0, 5, 1, 1), (5, 0, 1, 1), (-1, 0, 1, 1)])
+def test_roads_outside_the_graph_are_refused(road):
+    with pytest.raises(ValueError):
+        CSRGraph.from_roads([(0, 1, 1, 1), road], None, 10, [], 0, None, chunk_size=1)
+    with pytest.raises(ValueError):
+        CSRGraph.from_roads([(u + 3, v + 3, w1, w2) for u, v, w1, w2 in [(0, 1, 1, 1), road]], None, 10, [], 3, None)
+
+
+def snapshot(tmp_path):
+    path = tmp_path / "graph.bin"
+    CSRGraph.from_tuples([(0, 1, 5, 5), (1, 2, 5, 1)], None, 6, [1], 0, None).save(path)
+    return path
+
+
+def rewrite_header(path, **fields):
+    data = bytearray(path.read_bytes())
+    names = ("magic", "version", "byteorder", "typecode", "min_element", "layer", "roads")
+    header = dict(zip(names, CSRGraph.SNAPSHOT_HEADER.unpack_from(data)))
+    header.update(fields)
+    CSRGraph.SNAPSHOT_HEADER.pack_into(data, 0, *(header[name] for name in names))
+    path.write_bytes(bytes(data))
+
+
+@pytest.mark.parametrize("mapped", [False, True])
+@pytest.mark.parametrize("damage", ["magic", "version", "byteorder", "truncated", "short"])
+def test_load_refuses_damaged_snapshots_and_unmaps_them(tmp_path, monkeypatch, mapped, damage):
+    path = snapshot(tmp_path)
+    if damage == "magic":
+        rewrite_header(path, magic=b"NOTAGRPH")
+    elif damage == "version":
+        rewrite_header(path, version=CSRGraph.SNAPSHOT_VERSION + 1)
+    elif damage == "byteorder":
+        rewrite_header(path, byteorder=b"b" if sys.byteorder == "little" else b"l")
+    elif damage == "truncated":
+        path.write_bytes(path.read_bytes()[:-1])
+    else:
+        path.write_bytes(path.read_bytes()[:10])
+    mappings = []
+
+    def recording_mmap(*args, **kwargs):
+        mappings.append(mmap.mmap(*args, **kwargs))
+        return mappings[-1]
+    monkeypatch.setattr(carpool, "mmap", types.SimpleNamespace(mmap=recording_mmap, ACCESS_READ=mmap.ACCESS_READ))
+    with pytest.raises(ValueError):
+        CSRGraph.load(path, mapped=mapped)
+    assert all(mapping.closed for mapping in mappings)
+    assert len(mappings) == (1 if mapped else 0)
+
+
+def test_mapped_snapshots_are_read_only(tmp_path):
+    path = snapshot(tmp_path)
+    graph = CSRGraph.load(path)
+    with pytest.raises(ValueError):
+        graph.add_passengers([0])
+    with pytest.raises(ValueError):
+        graph.update_weight(0, 1, 1, 1)
+    assert graph.route(0, 2).cost == 6
+    graph.close()
+    copied = CSRGraph.load(path, mapped=False)
+    copied.add_passengers([0])
+    copied.update_weight(0, 1, 1, 1)
+    assert copied.route(0, 2).cost == 2